@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import logging
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 from dotenv import load_dotenv
-from src.agent.query_parser import NaturalLanguageQueryParser
+from src.agent.query_parser import NaturalLanguageQueryParser, QueryIntent
 from src.agent.jql_generator import JQLGenerator
 from src.agent.jira_client import JiraClient
+from src.agent.semantic_cache import SemanticCache, results_namespace
+from src.agent.ranking import bm25_top_k
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 送進 LLM 篩選的候選任務上限
+LLM_FILTER_CANDIDATES = 40
+
+# 單筆結果的輸出格式（結尾換行與 join 組合後即為項目間的空行）
+ROW_TMPL = (
+    "%2d. [%s] %s\n"
+    "    📁 專案: %s | 🏷️  類型: %s\n"
+    "    👤 指派: %s | 📅 更新: %s\n"
+    "    🔗 %s\n"
+)
+
 class JiraAgenticAI:
     """Jira Agentic AI 主類"""
 
@@ -18,48 +36,94 @@ class JiraAgenticAI:
             openai_api_key=os.getenv('AZURE_OPENAI_API_KEY')
         )
         self.jql_generator = JQLGenerator()
+        self.cache = SemanticCache()
+        self._executor = ThreadPoolExecutor(max_workers=2)
         try:
             self.jira_client = JiraClient()
         except Exception as e:
-            print(f"⚠️  Jira 客戶端初始化失敗: {e}")
-            print("請檢查 .env 檔案中的 Jira 配置")
+            logger.warning("⚠️  Jira 客戶端初始化失敗: %s（請檢查 .env 檔案中的 Jira 配置）", e)
             self.jira_client = None
 
     def process_query(self, query: str) -> Dict:
         """處理自然語言查詢"""
-        print(f"🔍 正在處理查詢: {query}")
+        logger.info("🔍 正在處理查詢: %s", query)
 
-        # 1. 解析查詢意圖
-        intent = self.parser.parse(query)
-        print(f"📝 解析意圖: {intent}")
+        # 1. 解析查詢意圖（語意相近的查詢直接重用快取）
+        intent = self._parse_query(query)
+        logger.info("📝 解析意圖: %s", intent)
 
         # 2. 生成 JQL 查詢
         jql_queries = self.jql_generator.generate_variations(intent)
-        print(f"🔧 生成 JQL: {jql_queries}")
+        # 本地就能確定語法有誤的 JQL 直接略過；無法判斷的交給查詢本身（失敗時回傳空結果）
+        jql_queries = [jql for jql in jql_queries if self.jql_generator.syntactic_validate(jql) is not False]
+        logger.info("🔧 生成 JQL: %s", jql_queries)
 
         # 3. 執行查詢
-        all_results = []
-        if self.jira_client:
-            for jql in jql_queries:
-                if self.jira_client.validate_jql(jql):
-                    results = self.jira_client.search_issues(jql)
-                    all_results.extend(results)
-                else:
-                    print(f"⚠️  無效的 JQL: {jql}")
+        # 以 key 去重（保留最先出現的一筆），重疊的任務不會重複送進 LLM 篩選
+        seen = {}
+        if self.jira_client and jql_queries:
+            # 各 JQL 變體同時送出，總延遲取決於最慢的一次查詢而非加總；
+            # 命令列只顯示基本欄位，不需要評論與時間追蹤等衍生欄位
+            for results in self.jira_client.search_many(jql_queries, with_details=False):
+                for result in results:
+                    seen.setdefault(result['key'], result)
+        elif not self.jira_client:
+            logger.warning("⚠️  無法執行 Jira 查詢，請檢查 Jira 客戶端配置")
+        all_results = list(seen.values())
+
+        # 4. 使用 LLM 篩選和排序結果（候選集合相同且查詢相近時重用快取）
+        # 先以 BM25 縮小候選集合，送進 LLM 的 token 數不再隨查到的任務數線性增加
+        candidates = bm25_top_k(query, all_results, LLM_FILTER_CANDIDATES) if self.parser.llm else all_results
+
+        # 快取只保存排序後的 key，命中時以這次查到的最新內容重建結果，狀態或指派異動不會讀到舊資料
+        filter_namespace = results_namespace('filter', candidates)
+        ranked_keys = self.cache.get(query, namespace=filter_namespace)
+        if ranked_keys is not None:
+            by_key = {r['key']: r for r in candidates}
+            filtered_results = [by_key[key] for key in ranked_keys if key in by_key]
         else:
-            print("⚠️  無法執行 Jira 查詢，請檢查 Jira 客戶端配置")
-
-        # 4. 使用 LLM 篩選和排序結果
-        filtered_results = self.parser.filter_results(query, all_results)
+            # 只快取 LLM 實際篩選過的結果；篩選失敗時改用全部查詢結果（BM25 只是為了縮小 LLM 的輸入，
+            # 未經篩選時不應截掉任務或少算總數），也不寫入持久化快取
+            filtered_results = self.parser.filter_results(query, candidates, fallback=False)
+            if filtered_results is None:
+                filtered_results = all_results
+            else:
+                self.cache.set(query, [r['key'] for r in filtered_results], namespace=filter_namespace)
 
         return {
             'query': query,
-            'intent': intent.dict(),
+            'intent': intent.model_dump(),
             'jql_queries': jql_queries,
             'results': filtered_results[:20],  # 限制結果數量
             'total_count': len(filtered_results)
         }
 
+    def _parse_query(self, query: str) -> QueryIntent:
+        """解析查詢意圖，優先使用快取
+
+        精確比對未命中時，語意比對（需計算嵌入向量）與 LLM 解析同時進行；
+        語意比對命中就直接採用快取結果，未命中也不必等嵌入計算完才開始呼叫 LLM。
+        """
+        cached_intent = self.cache.get(query, namespace='parse', semantic=False)
+        if cached_intent is not None:
+            return QueryIntent(**cached_intent)
+
+        if self.parser.llm and self.cache.semantic_enabled:
+            parse_future = self._executor.submit(self.parser.parse, query, fallback=False)
+            cached_intent = self.cache.get(query, namespace='parse')
+            if cached_intent is not None:
+                # LLM 請求已在背景執行，無法中止；回應仍會送達並計費，只是結果直接捨棄
+                return QueryIntent(**cached_intent)
+            intent = parse_future.result()
+        else:
+            intent = self.parser.parse(query, fallback=False)
+
+        if intent is None:
+            # 未設定 LLM 或 LLM 解析失敗：改用基本解析，備用結果不寫入持久化快取
+            return self.parser.basic_parse(query)
+        self.cache.set(query, intent.model_dump(), namespace='parse')
+        return intent
+
     def format_results(self, response: Dict) -> str:
         """格式化查詢結果"""
         output = []
@@ -75,17 +139,22 @@ class JiraAgenticAI:
 
         if response['results']:
             output.append("📋 查詢結果:")
-            for i, issue in enumerate(response['results'][:10], 1):
-                output.append(f"{i:2d}. [{issue['key']}] {issue['summary']}")
-                output.append(f"    📁 專案: {issue['project']} | 🏷️  類型: {issue['issuetype']}")
-                output.append(f"    👤 指派: {issue['assignee'] or '未指派'} | 📅 更新: {issue['updated'][:10]}")
-                output.append(f"    🔗 {issue['url']}")
-                output.append("")
+            output.extend(
+                ROW_TMPL % (i, issue['key'], issue['summary'], issue['project'], issue['issuetype'],
+                            issue['assignee'] or '未指派', issue['updated'][:10], issue['url'])
+                for i, issue in enumerate(response['results'][:10], 1)
+            )
 
         return "\n".join(output)
 
 def main():
     """主程式入口"""
+    # 互動使用時顯示處理過程；輸出被導向檔案或由其他程式呼叫時只保留警告
+    logging.basicConfig(
+        level=logging.INFO if sys.stdin.isatty() else logging.WARNING,
+        format='%(message)s'
+    )
+
     print("🤖 Jira Agentic AI 啟動！")
     print("輸入 'exit' 或 'quit' 結束程式")
     print("=" * 50)
@@ -5,10 +5,12 @@ Jira Agentic AI Agent 模組
 from .query_parser import NaturalLanguageQueryParser, QueryIntent
 from .jql_generator import JQLGenerator
 from .jira_client import JiraClient
+from .semantic_cache import SemanticCache
 
 __all__ = [
     'NaturalLanguageQueryParser',
     'QueryIntent',
     'JQLGenerator',
-    'JiraClient'
+    'JiraClient',
+    'SemanticCache'
 ]
\ No newline at end of file
@@ -1,19 +1,119 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import asyncio
+import logging
 import os
+import threading
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from . import json_utils
 
 try:
     from jira import JIRA
+    from jira.exceptions import JIRAError
+    from jira.resilientsession import raise_on_error
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     JIRA_AVAILABLE = True
 except ImportError:
     JIRA_AVAILABLE = False
 
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 只向 Jira 要求實際會讀取的欄位，避免下載完整 schema 與 changelog
+BASE_FIELDS = 'summary,status,assignee,reporter,created,updated,resolutiondate,priority,issuetype,project,description'
+DETAIL_FIELDS = BASE_FIELDS + ',timetracking,timespent,comment'
+
+
+def _parse_jira_datetime(value) -> Optional[datetime]:
+    """解析 Jira 回傳的 ISO 8601 時間字串"""
+    if not value:
+        return None
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+SECONDS_PER_DAY = 86400
+
+# 每個客戶端保持的 Jira 連線數，並行查詢時各自重用已建立的 TLS 連線
+DEFAULT_POOL_SIZE = 16
+
+
+def _epoch_seconds(value) -> Optional[int]:
+    """將 Jira 時間字串轉為 epoch 秒數"""
+    parsed = _parse_jira_datetime(value)
+    return int(parsed.timestamp()) if parsed is not None else None
+
+
+def _is_jql_error(error: Exception) -> bool:
+    """Jira 以 HTTP 400 回報 JQL 語法或欄位錯誤；逾時與 5xx 等暫時性錯誤不代表 JQL 無效"""
+    if JIRA_AVAILABLE and isinstance(error, JIRAError):
+        return error.status_code == 400
+    if AIOHTTP_AVAILABLE and isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 400
+    return False
+
+
+def _compute_durations(created_ts: List[Optional[int]], resolved_ts: List[Optional[int]],
+                       now_ts: int) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+    """以 epoch 秒數計算已完成任務的持續天數與未完成任務的處理天數（純整數運算）"""
+    duration_days = []
+    processing_days = []
+    for created, resolved in zip(created_ts, resolved_ts):
+        if created is None:
+            duration_days.append(None)
+            processing_days.append(None)
+        elif resolved is not None:
+            # 已完成任務：計算從創建到完成的時間
+            duration_days.append((resolved - created) // SECONDS_PER_DAY)
+            processing_days.append(None)
+        else:
+            # 未完成任務：計算從創建到現在的時間
+            duration_days.append(None)
+            processing_days.append((now_ts - created) // SECONDS_PER_DAY)
+    return duration_days, processing_days
+
+
+def _compute_day_spans(created_values: List, resolved_values: List,
+                       now: datetime) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+    """批次計算已完成任務的持續天數與未完成任務的處理天數"""
+    return _compute_durations(
+        [_epoch_seconds(value) for value in created_values],
+        [_epoch_seconds(value) for value in resolved_values],
+        int(now.timestamp())
+    )
+
+
+if JIRA_AVAILABLE:
+    class _FastJSONJIRA(JIRA):
+        """以 json_utils 解析 REST 回應的 JIRA 客戶端（安裝 orjson 時解析大型搜尋結果較快）"""
+
+        def _get_json(self, path: str, params: Dict = None, base: str = JIRA.JIRA_BASE_URL,
+                      use_post: bool = False):
+            url = self._get_url(path, base)
+            response = (
+                self._session.post(url, data=json_utils.dumps(params))
+                if use_post
+                else self._session.get(url, params=params)
+            )
+            raise_on_error(response)
+            # 空回應維持與 jira 套件相同的行為
+            return json_utils.loads(response.content) if response.content else {}
+
+
 class JiraClient:
     """Jira API 客戶端"""
 
-    def __init__(self, server_url: str = None, username: str = None, api_token: str = None):
+    def __init__(self, server_url: str = None, username: str = None, api_token: str = None,
+                 pool_size: int = DEFAULT_POOL_SIZE):
         if not JIRA_AVAILABLE:
             raise ImportError("請安裝 jira 套件: pip install jira")
 
@@ -24,132 +124,302 @@ class JiraClient:
         if not all([self.server_url, self.username, self.api_token]):
             raise ValueError("需要提供 Jira 伺服器 URL、用戶名和 API Token")
 
-        self.jira = JIRA(
+        self.jira = _FastJSONJIRA(
             server=self.server_url,
             basic_auth=(self.username, self.api_token)
         )
+        self.pool_size = pool_size
+        self._tune_session(self.jira._session, pool_size)
+
+        # 同一個 JQL 在短時間內重複查詢時直接使用快取，避免重複的網路往返
+        self._cache_lock = threading.Lock()
+        self._search_cache = TTLCache(maxsize=256, ttl=60)
+        self._validity_cache = TTLCache(maxsize=256, ttl=60)
+
+        self._async_client = None
+        if AIOHTTP_AVAILABLE:
+            self._async_client = AsyncJiraClient(self.server_url, self.username, self.api_token, pool_size,
+                                                 is_cloud=self.jira._is_cloud)
+
+    @staticmethod
+    def _tune_session(session, pool_size: int = DEFAULT_POOL_SIZE):
+        """加大連線池並保持連線，並行查詢時重用既有的 TLS 連線；閘道暫時性錯誤自動重試
+
+        429 與 503 已由 jira 的 ResilientSession 依 Retry-After 重試，這裡只處理 502/504，
+        避免兩層重試次數相乘；重試用完時回傳最後的回應（不拋出 RetryError），交給 ResilientSession 處理
+        """
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 504], raise_on_status=False)
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Accept-Encoding'] = 'gzip'
+
+    def search_issues(self, jql: str, max_results: int = 50, with_details: bool = True) -> List[Dict]:
+        """執行 JQL 查詢
+
+        with_details 為 False 時只回傳基本欄位，略過時間追蹤與評論等衍生欄位的計算
+        """
+        cache_key = (jql, max_results, with_details)
+        with self._cache_lock:
+            cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    def search_issues(self, jql: str, max_results: int = 50) -> List[Dict]:
-        """執行 JQL 查詢"""
         try:
-            # 擴展 changelog 和 comments 來獲取評論信息
-            issues = self.jira.search_issues(jql, maxResults=max_results, expand='changelog,comments')
-            results = []
-
-            for issue in issues:
-                # 計算任務持續時間
-                from datetime import datetime, timezone
-                duration_days = None
-                processing_days = None
-                
-                if issue.fields.created:
-                    created = datetime.fromisoformat(str(issue.fields.created).replace('Z', '+00:00'))
-                    now = datetime.now(timezone.utc)
-                    
-                    if issue.fields.resolutiondate:
-                        # 已完成任務：計算從創建到完成的時間
-                        resolved = datetime.fromisoformat(str(issue.fields.resolutiondate).replace('Z', '+00:00'))
-                        duration_days = (resolved - created).days
-                    else:
-                        # 未完成任務：計算從創建到現在的時間
-                        processing_days = (now - created).days
-
-                # 獲取時間追蹤信息
-                timetracking = getattr(issue.fields, 'timetracking', None)
-                timespent_seconds = getattr(issue.fields, 'timespent', None)
-                originalestimate_seconds = getattr(issue.fields, 'originalestimate', None)
-
-                # 轉換秒數為小時
-                timespent_hours = timespent_seconds / 3600 if timespent_seconds else None
-                originalestimate_hours = originalestimate_seconds / 3600 if originalestimate_seconds else None
-
-                # 獲取評論數量和評論內容
-                comment_count = 0  # 總評論數
-                my_comment_count = 0  # 我的評論數
-                comments_text = ""
-                my_comments_text = ""
-                
-                if hasattr(issue.fields, 'comment') and issue.fields.comment:
-                    comment_count = len(issue.fields.comment.comments)
-                    
-                    # 收集所有評論內容和我的評論內容（限制長度避免 token 過多）
-                    all_comments_list = []
-                    my_comments_list = []
-                    
-                    for comment in issue.fields.comment.comments:
-                        if hasattr(comment, 'body') and comment.body:
-                            # 每個評論限制 100 字符
-                            comment_text = comment.body[:100]
-                            all_comments_list.append(comment_text)
-                            
-                            # 檢查是否為當前用戶的評論
-                            if hasattr(comment, 'author') and comment.author:
-                                # 比較評論作者的 email 或 name
-                                author_email = getattr(comment.author, 'emailAddress', '')
-                                author_name = getattr(comment.author, 'name', '')
-                                
-                                if (author_email == self.username or 
-                                    author_name == self.username or 
-                                    author_email == self.username.split('@')[0]):
-                                    my_comment_count += 1
-                                    my_comments_list.append(comment_text)
-                            
-                            # 限制總長度
-                            if len('\n'.join(all_comments_list)) > 500:
-                                break
-                    
-                    comments_text = '\n'.join(all_comments_list)
-                    my_comments_text = '\n'.join(my_comments_list)
-
-                issue_data = {
-                    'key': issue.key,
-                    'summary': issue.fields.summary,
-                    'status': issue.fields.status.name,
-                    'assignee': issue.fields.assignee.displayName if issue.fields.assignee else None,
-                    'reporter': issue.fields.reporter.displayName if issue.fields.reporter else None,
-                    'created': str(issue.fields.created),
-                    'updated': str(issue.fields.updated),
-                    'resolutiondate': str(issue.fields.resolutiondate) if issue.fields.resolutiondate else None,
-                    'priority': issue.fields.priority.name if issue.fields.priority else None,
-                    'issuetype': issue.fields.issuetype.name,
-                    'project': issue.fields.project.name,
-                    'description': issue.fields.description[:200] + '...' if issue.fields.description and len(issue.fields.description) > 200 else issue.fields.description,
-                    'url': f"{self.server_url}/browse/{issue.key}",
-                    # 時間追蹤相關字段
-                    'timespent_hours': timespent_hours,
-                    'originalestimate_hours': originalestimate_hours,
-                    'duration_days': duration_days,  # 已完成任務的持續天數
-                    'processing_days': processing_days,  # 未完成任務的處理天數
-                    'comment_count': comment_count,  # 總評論數
-                    'my_comment_count': my_comment_count,  # 我的評論數
-                    'comments_text': comments_text,  # 所有評論內容
-                    'my_comments_text': my_comments_text,  # 我的評論內容
-                    'timetracking': {
-                        'originalEstimate': getattr(timetracking, 'originalEstimate', None) if timetracking else None,
-                        'remainingEstimate': getattr(timetracking, 'remainingEstimate', None) if timetracking else None,
-                        'timeSpent': getattr(timetracking, 'timeSpent', None) if timetracking else None
-                    } if timetracking else None
-                }
-                results.append(issue_data)
-
-            return results
+            # 直接取用原始 JSON，略過 jira 套件的 Resource 物件包裝
+            if with_details:
+                # 擴展 comments 來獲取評論信息
+                response = self.jira.search_issues(jql, maxResults=max_results, fields=DETAIL_FIELDS,
+                                                   expand='comments', json_result=True)
+            else:
+                response = self.jira.search_issues(jql, maxResults=max_results, fields=BASE_FIELDS,
+                                                   json_result=True)
+            results = self._build_results(response['issues'], with_details)
         except Exception as e:
-            print(f"JQL 查詢失敗: {e}")
+            logger.warning("JQL 查詢失敗: %s - %s", jql, e)
+            self._mark_invalid(jql, e)
             return []
 
+        self._store_results(jql, cache_key, results)
+        return results
+
+    def search_many(self, jqls: List[str], max_results: int = 50, with_details: bool = True) -> List[List[Dict]]:
+        """並行執行多個 JQL 查詢，回傳與 jqls 順序對應的結果列表（失敗的查詢為空列表）"""
+        results_by_jql = {}
+        pending = []
+        for jql in dict.fromkeys(jqls):
+            with self._cache_lock:
+                cached = self._search_cache.get((jql, max_results, with_details))
+            if cached is not None:
+                results_by_jql[jql] = cached
+            else:
+                pending.append(jql)
+
+        if pending and self._async_client is not None:
+            # 以 aiohttp 在單一事件迴圈中同時等待所有請求
+            fields = DETAIL_FIELDS if with_details else BASE_FIELDS
+            expand = 'comments' if with_details else None
+            pages = asyncio.run(self._async_client.search_many(pending, max_results, fields, expand))
+            for jql, issues in zip(pending, pages):
+                if isinstance(issues, Exception):
+                    logger.warning("JQL 查詢失敗: %s - %s", jql, issues)
+                    self._mark_invalid(jql, issues)
+                    results_by_jql[jql] = []
+                    continue
+                results = self._build_results(issues, with_details)
+                self._store_results(jql, (jql, max_results, with_details), results)
+                results_by_jql[jql] = results
+        elif pending:
+            with ThreadPoolExecutor(max_workers=min(self.pool_size, len(pending))) as executor:
+                pages = executor.map(lambda j: self.search_issues(j, max_results, with_details), pending)
+                results_by_jql.update(zip(pending, pages))
+
+        return [results_by_jql[jql] for jql in jqls]
+
+    def _store_results(self, jql: str, cache_key: Tuple, results: List[Dict]):
+        """寫入查詢快取；查詢成功即代表 JQL 語法有效，後續 validate_jql 不必再發出請求"""
+        with self._cache_lock:
+            self._search_cache[cache_key] = results
+            self._validity_cache[jql] = True
+
+    def _mark_invalid(self, jql: str, error: Exception):
+        """查詢因 JQL 錯誤失敗時記錄為無效；暫時性錯誤不寫入，避免有效的 JQL 在快取期間被略過"""
+        if _is_jql_error(error):
+            with self._cache_lock:
+                self._validity_cache[jql] = False
+
+    def _build_results(self, issues: List[Dict], with_details: bool) -> List[Dict]:
+        """將 Jira REST 回傳的 issue JSON 轉換為結果字典"""
+        results = []
+        for issue in issues:
+            fields = issue['fields']
+            description = fields.get('description')
+            results.append({
+                'key': issue['key'],
+                'summary': fields.get('summary'),
+                'status': (fields.get('status') or {}).get('name'),
+                'assignee': (fields.get('assignee') or {}).get('displayName'),
+                'reporter': (fields.get('reporter') or {}).get('displayName'),
+                'created': str(fields.get('created')),
+                'updated': str(fields.get('updated')),
+                'resolutiondate': str(fields['resolutiondate']) if fields.get('resolutiondate') else None,
+                'priority': (fields.get('priority') or {}).get('name'),
+                'issuetype': (fields.get('issuetype') or {}).get('name'),
+                'project': (fields.get('project') or {}).get('name'),
+                'description': description[:200] + '...' if description and len(description) > 200 else description,
+                'url': f"{self.server_url}/browse/{issue['key']}"
+            })
+
+        if with_details:
+            # 整批計算任務持續時間，「現在」時間只取一次
+            all_duration_days, all_processing_days = _compute_day_spans(
+                [issue['fields'].get('created') for issue in issues],
+                [issue['fields'].get('resolutiondate') for issue in issues],
+                datetime.now(timezone.utc)
+            )
+            for issue_data, issue, duration_days, processing_days in zip(
+                    results, issues, all_duration_days, all_processing_days):
+                issue_data.update(self._issue_details(issue['fields'], duration_days, processing_days))
+
+        return results
+
+    def _issue_details(self, fields: Dict, duration_days: Optional[int], processing_days: Optional[int]) -> Dict:
+        """計算時間追蹤與評論相關的衍生欄位"""
+        # 獲取時間追蹤信息
+        timetracking = None
+        raw_timetracking = fields.get('timetracking')
+        if raw_timetracking:
+            timetracking = {
+                'originalEstimate': raw_timetracking.get('originalEstimate'),
+                'remainingEstimate': raw_timetracking.get('remainingEstimate'),
+                'timeSpent': raw_timetracking.get('timeSpent')
+            }
+        timespent_seconds = fields.get('timespent')
+        originalestimate_seconds = fields.get('originalestimate')
+
+        # 轉換秒數為小時
+        timespent_hours = timespent_seconds / 3600 if timespent_seconds else None
+        originalestimate_hours = originalestimate_seconds / 3600 if originalestimate_seconds else None
+
+        # 獲取評論數量和評論內容
+        comment_count = 0  # 總評論數
+        my_comment_count = 0  # 我的評論數
+        comments_text = ""
+        my_comments_text = ""
+
+        comment_field = fields.get('comment')
+        if comment_field:
+            comments = comment_field.get('comments') or []
+            comment_count = len(comments)
+
+            # 收集所有評論內容和我的評論內容（限制長度避免 token 過多）
+            all_comments_list = []
+            my_comments_list = []
+
+            # 以剩餘字數預算限制總長度，不必每次重新 join 整個列表來量測
+            budget = 500
+            for comment in comments:
+                # 每個評論限制 100 字符
+                comment_text = (comment.get('body') or '')[:100]
+                if not comment_text:
+                    continue
+                if budget - len(comment_text) - 1 < 0:
+                    break
+                all_comments_list.append(comment_text)
+                budget -= len(comment_text) + 1
+
+                # 檢查是否為當前用戶的評論
+                author = comment.get('author')
+                if author:
+                    # 比較評論作者的 email 或 name
+                    author_email = author.get('emailAddress', '')
+                    author_name = author.get('name', '')
+
+                    if (author_email == self.username or
+                        author_name == self.username or
+                        author_email == self.username.split('@')[0]):
+                        my_comment_count += 1
+                        my_comments_list.append(comment_text)
+
+            comments_text = '\n'.join(all_comments_list)
+            my_comments_text = '\n'.join(my_comments_list)
+
+        return {
+            # 時間追蹤相關字段
+            'timespent_hours': timespent_hours,
+            'originalestimate_hours': originalestimate_hours,
+            'duration_days': duration_days,  # 已完成任務的持續天數
+            'processing_days': processing_days,  # 未完成任務的處理天數
+            'comment_count': comment_count,  # 總評論數
+            'my_comment_count': my_comment_count,  # 我的評論數
+            'comments_text': comments_text,  # 所有評論內容
+            'my_comments_text': my_comments_text,  # 我的評論內容
+            'timetracking': timetracking
+        }
+
     def get_user_projects(self) -> List[Dict]:
         """取得用戶可存取的專案"""
         try:
             projects = self.jira.projects()
             return [{'key': p.key, 'name': p.name} for p in projects]
         except Exception as e:
-            print(f"取得專案列表失敗: {e}")
+            logger.error("取得專案列表失敗: %s", e)
             return []
 
     def validate_jql(self, jql: str) -> bool:
         """驗證 JQL 語法"""
+        with self._cache_lock:
+            cached = self._validity_cache.get(jql)
+        if cached is not None:
+            return cached
+
         try:
-            self.jira.search_issues(jql, maxResults=1)
-            return True
-        except Exception:
-            return False
\ No newline at end of file
+            self.jira.search_issues(jql, maxResults=1, fields='key', json_result=True)
+            valid = True
+        except Exception as e:
+            if not _is_jql_error(e):
+                # 無法判斷語法是否正確，這次視為無效但不寫入快取
+                logger.warning("JQL 驗證失敗: %s - %s", jql, e)
+                return False
+            valid = False
+
+        with self._cache_lock:
+            self._validity_cache[jql] = valid
+        return valid
+
+
+class AsyncJiraClient:
+    """以 aiohttp 並行執行 JQL 查詢的 Jira REST 客戶端"""
+
+    def __init__(self, server_url: str = None, username: str = None, api_token: str = None,
+                 pool_size: int = DEFAULT_POOL_SIZE, is_cloud: bool = None):
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("請安裝 aiohttp 套件: pip install aiohttp")
+
+        self.server_url = (server_url or os.getenv('JIRA_SERVER_URL') or '').rstrip('/')
+        self.username = username or os.getenv('JIRA_USERNAME')
+        self.api_token = api_token or os.getenv('JIRA_API_TOKEN')
+
+        if not all([self.server_url, self.username, self.api_token]):
+            raise ValueError("需要提供 Jira 伺服器 URL、用戶名和 API Token")
+        self.pool_size = pool_size
+        # JiraClient 會傳入 jira 套件取得的部署類型；單獨使用時以網域判斷是否為 Jira Cloud
+        self.is_cloud = is_cloud if is_cloud is not None else self.server_url.endswith('.atlassian.net')
+
+    async def search_issues(self, jql: str, max_results: int = 50,
+                            fields: str = DETAIL_FIELDS, expand: str = None) -> List:
+        """執行單一 JQL 查詢，回傳 issue 的原始 JSON 列表"""
+        return (await self.search_many([jql], max_results, fields, expand))[0]
+
+    async def search_many(self, jqls: List[str], max_results: int = 50,
+                          fields: str = DETAIL_FIELDS, expand: str = None) -> List:
+        """同時執行多個 JQL 查詢；個別查詢失敗時在對應位置回傳例外物件"""
+        # 同一批查詢共用連線池，TCP 與 TLS 握手只需一次
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+        auth = aiohttp.BasicAuth(self.username, self.api_token)
+        async with aiohttp.ClientSession(connector=connector, auth=auth) as session:
+            return await asyncio.gather(
+                *[self._search(session, jql, max_results, fields, expand) for jql in jqls],
+                return_exceptions=True
+            )
+
+    async def _search(self, session, jql: str, max_results: int, fields: str, expand: Optional[str]) -> List:
+        payload = {'jql': jql, 'maxResults': max_results, 'fields': fields.split(',')}
+        if self.is_cloud:
+            # Jira Cloud 已移除 /search，與 jira 套件的 enhanced_search_issues 相同改用 /search/jql（expand 為逗號分隔字串）
+            url = f"{self.server_url}/rest/api/2/search/jql"
+            if expand:
+                payload['expand'] = expand
+        else:
+            url = f"{self.server_url}/rest/api/2/search"
+            if expand:
+                payload['expand'] = expand.split(',')
+
+        async with session.post(url, json=payload) as response:
+            response.raise_for_status()
+            body = await response.read()
+
+        return json_utils.loads(body)['issues']
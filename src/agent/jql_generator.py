@@ -1,9 +1,77 @@
 from typing import List, Optional, Any
+import logging
+import re
+import threading
+from cachetools import LRUCache
 from .query_parser import QueryIntent
 
+logger = logging.getLogger(__name__)
+
+# 關鍵字條件的組合順序：主要關鍵字在前，相關關鍵字在後
+_KEYWORD_CONDITION_KEYS = ('main_keyword_conditions', 'related_keyword_conditions')
+
+# JQL 片段模板
+_PROJECT_TMPL = "project = '{v}'"
+_TIME_TMPL = "created >= '{s}' AND created <= '{e}'"
+_OR_GROUP_TMPL = "({})"
+_ORDER_TMPL = "{} ORDER BY updated DESC"
+
+
+# 本地語法檢查：生成器會用到的欄位、保留字，以及「欄位 運算子」與結尾 ORDER BY 的樣式
+_KNOWN_FIELDS = frozenset({
+    'project', 'assignee', 'reporter', 'status', 'created', 'updated', 'resolved', 'resolutiondate',
+    'priority', 'issuetype', 'type', 'summary', 'description', 'comment', 'text', 'labels',
+    'component', 'fixversion', 'key', 'watcher', 'sprint', 'duedate', 'resolution'
+})
+_JQL_RESERVED = frozenset({'and', 'or', 'not', 'is', 'in', 'empty', 'null', 'order', 'by', 'was', 'changed'})
+_FIELD_OPERATOR_RE = re.compile(
+    r'\b([A-Za-z][\w.]*)\s*(?:!=|!~|>=|<=|=|~|>|<|\s(?:NOT\s+IN|IN|IS|WAS|CHANGED)\b)',
+    re.IGNORECASE
+)
+_ORDER_BY_RE = re.compile(
+    r'\sORDER\s+BY\s+[A-Za-z]\w*(?:\s+(?:ASC|DESC))?(?:\s*,\s*[A-Za-z]\w*(?:\s+(?:ASC|DESC))?)*\s*$',
+    re.IGNORECASE
+)
+
+
+def _strip_quoted(jql: str) -> Optional[str]:
+    """移除引號內的字串內容（保留空引號），遇到未閉合的引號時回傳 None"""
+    output = []
+    quote = None
+    escaped = False
+    for char in jql:
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == quote:
+                output.append(char)
+                quote = None
+        else:
+            output.append(char)
+            if char in ('"', "'"):
+                quote = char
+    return None if quote else ''.join(output)
+
+
+def _freeze(value: Any) -> Any:
+    """將巢狀的 dict / list 轉為可雜湊的 tuple，作為快取鍵"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
 class JQLGenerator:
     """JQL 查詢語句生成器"""
 
+    def __init__(self):
+        # 相同的查詢意圖直接重用已組好的 JQL
+        self._variations_lock = threading.Lock()
+        self._variations_cache = LRUCache(maxsize=128)
+
     def generate(self, intent: QueryIntent) -> str:
         """根據查詢意圖生成 JQL"""
         jql_parts = []
@@ -30,10 +98,10 @@ class JQLGenerator:
 
         # 專案
         if 'project' in entities:
-            print(f"JQL 生成器接收到項目條件: {entities['project']}")
+            logger.debug("JQL 生成器接收到項目條件: %s", entities['project'])
             jql_parts.append(f"project = '{entities['project']}'")
         else:
-            print("JQL 生成器未接收到項目條件")
+            logger.debug("JQL 生成器未接收到項目條件")
 
         # 工作項目類型
         if 'issue_type' in entities:
@@ -109,66 +177,86 @@ class JQLGenerator:
 
         return jql
 
+    def syntactic_validate(self, jql: str) -> Optional[bool]:
+        """不經網路檢查 JQL 語法
+
+        回傳 False 表示確定有誤（引號或括號不成對、缺少 ORDER BY），
+        True 表示符合生成器的語法，None 表示無法判斷（例如使用了未知欄位），需交由 Jira 驗證。
+        """
+        if not jql or not jql.strip():
+            return False
+
+        stripped = _strip_quoted(jql)
+        if stripped is None:
+            return False
+
+        depth = 0
+        for char in stripped:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth < 0:
+                    return False
+        if depth != 0:
+            return False
+
+        order_by = _ORDER_BY_RE.search(stripped)
+        if not order_by:
+            return False
+
+        where_clause = stripped[:order_by.start()]
+        fields = [f.lower() for f in _FIELD_OPERATOR_RE.findall(where_clause)]
+        if not fields:
+            return None
+        if any(f not in _KNOWN_FIELDS and f not in _JQL_RESERVED for f in fields):
+            return None
+        return True
+
     def generate_variations(self, intent: QueryIntent) -> List[str]:
         """生成 JQL 查詢變體 - 使用簡化策略：先查所有相關任務，再用 LLM 篩選"""
-        jql_queries = []
-        entities = intent.entities
+        cache_key = (_freeze(intent.entities), intent.is_exclusion)
+        with self._variations_lock:
+            cached = self._variations_cache.get(cache_key)
+        if cached is None:
+            cached = tuple(self._build_variations(intent))
+            with self._variations_lock:
+                self._variations_cache[cache_key] = cached
+        return list(cached)
 
-        # 構建基本條件
-        base_conditions = []
+    def _build_variations(self, intent: QueryIntent) -> List[str]:
+        """組合 JQL 查詢變體"""
+        entities = intent.entities
+        conditions = []
 
         # 添加項目條件（最重要的過濾條件）
-        if 'project' in entities and entities['project']:
-            print(f"JQL 生成器接收到項目條件: {entities['project']}")
-            base_conditions.append(f"project = '{entities['project']}'")
+        project = entities.get('project')
+        if project:
+            logger.debug("JQL 生成器接收到項目條件: %s", project)
+            conditions.append(_PROJECT_TMPL.format(v=project))
         else:
-            print("JQL 生成器未接收到項目條件")
+            logger.debug("JQL 生成器未接收到項目條件")
 
         # 添加時間範圍
-        time_range = entities.get("time_range")
-        if time_range and time_range.get("start") and time_range.get("end"):
-            base_conditions.append(
-                f"created >= '{time_range['start']}' AND created <= '{time_range['end']}'"
-            )
-
-        # 添加用戶條件（用 OR 連接，表示「我參與的任務」）
-        user_conditions = entities.get("user_conditions", [])
+        time_range = entities.get('time_range')
+        if time_range and time_range.get('start') and time_range.get('end'):
+            conditions.append(_TIME_TMPL.format(s=time_range['start'], e=time_range['end']))
+
+        # 添加用戶條件（多個條件用 OR 連接，表示「我參與的任務」）
+        user_conditions = entities.get('user_conditions')
         if user_conditions:
-            if len(user_conditions) == 1:
-                base_conditions.append(user_conditions[0])
-            else:
-                # 多個用戶條件用 OR 連接
-                user_query = f"({' OR '.join(user_conditions)})"
-                base_conditions.append(user_query)
-                print(f"用戶條件（OR 連接）: {user_query}")
+            conditions.append(user_conditions[0] if len(user_conditions) == 1
+                              else _OR_GROUP_TMPL.format(' OR '.join(user_conditions)))
 
         # 排除性查詢處理：如果是排除性查詢，不添加關鍵字搜尋條件
         if intent.is_exclusion:
-            print(f"檢測到排除性查詢，不添加關鍵字搜尋條件。排除關鍵字: {intent.excluded_keywords}")
+            logger.debug("檢測到排除性查詢，不添加關鍵字搜尋條件。排除關鍵字: %s", intent.excluded_keywords)
         else:
-            # 添加關鍵字條件
-            main_keyword_conditions = entities.get("main_keyword_conditions", [])
-            related_keyword_conditions = entities.get("related_keyword_conditions", [])
-            
-            keyword_conditions = []
-            keyword_conditions.extend(main_keyword_conditions)
-            keyword_conditions.extend(related_keyword_conditions)
-            
+            keyword_conditions = [c for k in _KEYWORD_CONDITION_KEYS for c in entities.get(k, ())]
             if keyword_conditions:
-                # 將關鍵字條件用 OR 連接
-                keyword_query = f"({' OR '.join(keyword_conditions)})"
-                base_conditions.append(keyword_query)
-                print(f"添加關鍵字條件: {keyword_query}")
-
-        # 構建最終查詢
-        if base_conditions:
-            final_query = " AND ".join(base_conditions) + " ORDER BY updated DESC"
-            jql_queries.append(final_query)
-            print(f"生成的 JQL 查詢: {final_query}")
-        else:
-            # 最基本的查詢 - 測試連接
-            basic_query = "project IS NOT EMPTY ORDER BY updated DESC"
-            jql_queries.append(basic_query)
-            print(f"基本連接測試查詢: {basic_query}")
+                conditions.append(_OR_GROUP_TMPL.format(' OR '.join(keyword_conditions)))
 
-        return jql_queries
\ No newline at end of file
+        # 構建最終查詢；沒有任何條件時使用最基本的查詢
+        final_query = _ORDER_TMPL.format(" AND ".join(conditions) if conditions else "project IS NOT EMPTY")
+        logger.debug("生成的 JQL 查詢: %s", final_query)
+        return [final_query]
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+JSON 工具：安裝 orjson 時使用 orjson 加速，否則退回標準庫 json
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """解析 JSON 字串或位元組"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> str:
+    """序列化為緊湊的 JSON 字串（保留非 ASCII 字元）"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """序列化為 UTF-8 編碼的緊湊 JSON，可直接作為 HTTP 回應內容"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -1,7 +1,11 @@
 from src.agent.query_parser import NaturalLanguageQueryParser, QueryIntent
 from src.agent.jql_generator import JQLGenerator
 from src.agent.jira_client import JiraClient
-from typing import List, Tuple, Any
+from typing import Dict, List, Tuple
+from operator import itemgetter
+import logging
+
+logger = logging.getLogger(__name__)
 
 class NaturalLanguageAgent:
     """自然語言代理，協調查詢解析、JQL 生成和 Jira 互動"""
@@ -11,7 +15,7 @@ class NaturalLanguageAgent:
         self.jql_generator = JQLGenerator()
         self.jira_client = jira_client
 
-    def process_query(self, query: str) -> Tuple[List[Any], List[str]]:
+    def process_query(self, query: str) -> Tuple[List[Dict], List[str]]:
         """
         處理自然語言查詢，返回 Jira 任務和使用的 JQL 查詢列表。
         """
@@ -20,28 +24,28 @@ class NaturalLanguageAgent:
 
         # 1. 解析自然語言查詢，獲取意圖和實體
         intent: QueryIntent = self.query_parser.parse(query)
-        print(f"解析到的意圖: {intent.intent_type}, 實體: {intent.entities}")
+        logger.info("解析到的意圖: %s, 實體: %s", intent.intent_type, intent.entities)
 
         # 2. 根據意圖生成 JQL 查詢
         jql_queries = self.jql_generator.generate_variations(intent)
-        print(f"生成的 JQL 查詢變體: {jql_queries}")
+        logger.info("生成的 JQL 查詢變體: %s", jql_queries)
 
         all_issues = []
         unique_issue_keys = set()
 
-        # 3. 執行 JQL 查詢並獲取結果
+        # 3. 執行 JQL 查詢並獲取結果（只需要基本欄位，略過評論與時間追蹤）
         for jql in jql_queries:
             try:
-                issues = self.jira_client.search_issues(jql)
+                issues = self.jira_client.search_issues(jql, with_details=False)
                 for issue in issues:
-                    if issue.key not in unique_issue_keys:
+                    if issue['key'] not in unique_issue_keys:
                         all_issues.append(issue)
-                        unique_issue_keys.add(issue.key)
+                        unique_issue_keys.add(issue['key'])
             except Exception as e:
-                print(f"執行 JQL 查詢失敗: {jql} - {e}")
+                logger.warning("執行 JQL 查詢失敗: %s - %s", jql, e)
                 # 可以在這裡選擇是否繼續執行其他 JQL 變體
 
         # 對結果進行排序 (例如按更新時間倒序)
-        all_issues.sort(key=lambda issue: issue.fields.updated, reverse=True)
+        all_issues.sort(key=itemgetter('updated'), reverse=True)
 
         return all_issues, jql_queries
\ No newline at end of file
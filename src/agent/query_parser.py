@@ -2,25 +2,124 @@
 自然語言查詢解析器
 """
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Callable, Union, Set
 from enum import Enum
 import re
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel
-import arrow
+import calendar
 import os
+import asyncio
 import json # Added for JSON parsing
-try:
-    from langchain.llms import AzureOpenAI  # 改用 AzureOpenAI
-    from langchain.prompts import PromptTemplate
-    from langchain.chains import LLMChain
-    LANGCHAIN_AVAILABLE = True
-except ImportError:
-    LANGCHAIN_AVAILABLE = False
-
+import hashlib
+import logging
+import threading
+from operator import attrgetter
+from cachetools import TTLCache
 from langchain_community.chat_models import AzureChatOpenAI  # 改用 chat models
-from langchain.schema import HumanMessage
-from langchain.prompts import ChatPromptTemplate  # 改用 chat prompt
+from langchain_core.prompts import ChatPromptTemplate  # 改用 chat prompt
+
+from . import json_utils
+
+logger = logging.getLogger(__name__)
+
+
+# 關鍵字擴展的固定說明與範例放在 system 訊息作為共同前綴，只有最後的查詢內容會變動
+KEYWORD_EXPANSION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """根據用戶的查詢，提取相關的 Jira 任務關鍵字，以逗號分隔輸出。
+
+**重要注意事項：**
+1. 忽略排序相關的詞語（如：最久、最新、最近、最長時間、處理最久等）
+2. **不要包含通用詞彙**：任務、工作、項目、Task、Work、Project、Issue、Bug、Feature等
+3. 只提取具體的技術關鍵字、功能名稱、產品名稱或業務領域詞彙
+4. 如果查詢太通用或沒有具體關鍵字，返回空字串
+
+**範例：**
+輸入: "跟 iOS 有關且處理最久的"
+輸出: "iOS, iPhone, iPad, Swift, Objective-C, Xcode, 手機, app, 移動開發"
+
+輸入: "排行榜以外的工作"
+輸出: "用戶管理, 登入, 註冊, 設定, 支付, 通知, 數據分析, API, 後台管理"
+
+輸入: "提升用戶留存率"
+輸出: "用戶留存, 用戶體驗, 活躍用戶, 產品優化, 數據分析, 報告, 行為分析, 儀表板, 忠誠度, app, 功能改進"
+
+輸入: "我留言最多的 Task"
+輸出: \"\""""),
+    ("human", "目標/任務/查詢: {text}\n\n關鍵字:")
+])
+
+
+# 結果篩選：固定的篩選規則放在 system 訊息，查詢與任務清單（緊湊 JSON）放在最後
+FILTER_RESULTS_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """你是一個 Jira 任務篩選助手。根據用戶的原始查詢，從任務清單中挑出真正相關的任務並評分。
+
+規則：
+1. 任務清單為 JSON 陣列，每筆包含 key、summary（標題）與 description（描述）
+2. 如果查詢包含「無關」、「以外」、「除了」、「不包括」、「不是」、「非」等排除性語言，必須排除包含指定關鍵字的任務
+3. 相關性分數範圍 0-1，只返回分數 > 0.3 的任務
+4. 只返回 JSON（不要包含任何 markdown 標記），格式如下：
+{{"relevant_issues": [{{"key": "TASK-123", "relevance_score": 0.9, "reason": "標題提到 iOS 登入流程"}}]}}"""),
+    ("human", "原始查詢: {original_query}\n\n任務清單:\n{jira_results}")
+])
+
+
+def _month_range(year: int, month: int) -> Tuple[str, str]:
+    """回傳該月第一天與最後一天"""
+    last_day = calendar.monthrange(year, month)[1]
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
+
+
+def _week_range(day: date) -> Tuple[str, str]:
+    """回傳該日所在週的週一與週日"""
+    start = day - timedelta(days=day.weekday())
+    end = start + timedelta(days=6)
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+
+# LLM 常把 JSON 包在 markdown 程式碼區塊中（```json ... ```）
+_CODE_FENCE_RE = re.compile(r'^```[\w+-]*\s*(.*?)\s*```$', re.DOTALL)
+
+
+def strip_code_fence(content: str) -> str:
+    """去除 LLM 回應外層的 markdown 程式碼區塊標記"""
+    content = content.strip()
+    match = _CODE_FENCE_RE.match(content)
+    return match.group(1).strip() if match else content
+
+
+# 通用詞彙，避免將其當作搜尋關鍵字
+COMMON_WORDS = frozenset({
+    # 中文通用詞
+    '任務', '工作', '項目', '問題', '需求', '功能', '系統', '平台',
+    '管理', '開發', '設計', '測試', '修復', '優化', '更新', '維護',
+    '實現', '完成', '處理', '解決', '改進', '增加', '減少', '提升',
+    # 英文通用詞
+    'task', 'work', 'project', 'issue', 'feature', 'bug', 'system', 'platform',
+    'management', 'development', 'design', 'test', 'fix', 'optimize', 'update', 'maintain',
+    'implement', 'complete', 'process', 'solve', 'improve', 'add', 'reduce', 'enhance',
+    # 其他通用詞
+    'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'from', 'of', 'is', 'are',
+    '的', '和', '或', '在', '於', '為', '與', '由', '從', '是', '有', '沒有'
+})
+
+# LLM 關鍵字擴展結果中要濾掉的通用詞彙
+_EXPANSION_STOPWORDS = frozenset({
+    '任務', '工作', '項目', '問題', '需求', '功能', '系統', '平台',
+    'task', 'work', 'project', 'issue', 'feature', 'bug', 'system', 'platform'
+})
+
+# 不構成搜尋關鍵字的固定用語（人稱、任務泛稱、查詢動詞、排序詞），去除後沒有其他文字的查詢不必交給 LLM
+_FILLER_WORDS = (
+    '我的', '我做的', '我做', '我', '用戶', '使用者', '的', '了', '過', '所有', '全部', '哪些', '有哪些', '列出',
+    '找', '搜尋', '查詢', '參與', '在', '中', '期間', '任務', '工作', '工作項目', '工作記錄', '記錄', '項目',
+    '最久', '處理最久', '持續最久', '最長時間', '最長', '最新', '最近', '新建',
+    'jira', 'my', 'task', 'tasks', 'issue', 'issues', 'work', 'search', 'find',
+)
+_FILLER_RE = re.compile(
+    '|'.join(sorted(map(re.escape, _FILLER_WORDS), key=len, reverse=True)) + r'|[\s，。！？、,.!?]',
+    re.IGNORECASE
+)
 
 
 class QueryIntentType(Enum):
@@ -41,23 +140,60 @@ class QueryIntent(BaseModel):
     is_exclusion: bool = False  # 是否為排除性查詢
     excluded_keywords: List[str] = []  # 需要排除的關鍵詞
 
-    def model_dump(self):  # 替換 dict() 方法
-        return {
-            "intent_type": self.intent_type,
-            "confidence": self.confidence,
-            "entities": self.entities,
-            "is_exclusion": self.is_exclusion,
-            "excluded_keywords": self.excluded_keywords
-        }
+
+class ParsedKeywords(BaseModel):
+    """LLM 分析結果：關鍵字"""
+    main: List[str] = []
+    related: List[str] = []
+
+
+class ParsedExclusion(BaseModel):
+    """LLM 分析結果：排除性查詢"""
+    is_exclusion: bool = False
+    excluded_keywords: List[str] = []
+
+
+class ParsedTime(BaseModel):
+    """LLM 分析結果：時間範圍"""
+    year: Optional[Union[str, int]] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+
+class ParsedQuery(BaseModel):
+    """LLM 分析結果，解析 JSON 時一併驗證結構"""
+    keywords: ParsedKeywords = ParsedKeywords()
+    exclusion: ParsedExclusion = ParsedExclusion()
+    project: Optional[str] = None
+    time: Optional[ParsedTime] = None
+
+
+class RelevantIssue(BaseModel):
+    """LLM 篩選結果：單筆相關任務"""
+    key: str
+    relevance_score: float = 0.0
+    reason: str = ""
+
+
+class FilterResult(BaseModel):
+    """LLM 篩選結果，解析 JSON 時一併驗證結構"""
+    relevant_issues: List[RelevantIssue] = []
 
 
 class NaturalLanguageQueryParser:
     """自然語言查詢解析器"""
 
-    def __init__(self, openai_api_key: str = None, jira_username: str = None):
+    def __init__(self, openai_api_key: str = None, jira_username: str = None, enable_cache: bool = True):
         self.llm = None
         self.jira_username = jira_username or os.getenv("JIRA_USERNAME")  # 獲取 Jira 用戶名
 
+        # LLM 分析結果快取，重複的查詢不必再等待一次 LLM 往返；
+        # LLM 設定為非確定性輸出（temperature > 0）時可傳入 enable_cache=False 每次重新分析
+        self.enable_cache = enable_cache
+        self._cache_lock = threading.Lock()
+        self._parse_cache = TTLCache(maxsize=256, ttl=3600)
+        self._keyword_cache = TTLCache(maxsize=1024, ttl=3600)
+
         try:
             self.llm = AzureChatOpenAI(
                 deployment_name=os.getenv("AZURE_DEPLOYMENT_NAME"),
@@ -73,8 +209,7 @@ class NaturalLanguageQueryParser:
 1. 年份信息（例如 2025）必須被識別並包含在結果中
 2. 用戶相關的條件（指派、創建、評論）必須被正確識別
 3. 關鍵詞必須保持原始大小寫
-4. **重要：必須忽略排序相關的詞語（如：最久、最新、最近、最長時間、處理最久、持續最久等），這些不是搜索關鍵詞**"""),
-                ("human", """請分析這個查詢：{query}
+4. **重要：必須忽略排序相關的詞語（如：最久、最新、最近、最長時間、處理最久、持續最久等），這些不是搜索關鍵詞**
 
 請提取以下信息並以 JSON 格式返回（不要包含任何 markdown 標記）：
 {{
@@ -121,13 +256,17 @@ class NaturalLanguageQueryParser:
 項目名稱提取示例：
 - "In the KFC project, I participated in tasks" → project: "KFC"
 - "Show me tasks in ABC project" → project: "ABC"
-- "在 XYZ 專案中的工作" → project: "XYZ""")
+- "在 XYZ 專案中的工作" → project: "XYZ\""""),
+                # 固定的說明全部放在 system 訊息作為共同前綴（可命中 Azure OpenAI 的提示快取），每次變動的查詢放在最後
+                ("human", "請分析這個查詢：{query}")
             ])
 
             self.chain = self.analysis_prompt | self.llm
+            self._expand_chain = KEYWORD_EXPANSION_PROMPT | self.llm
+            self.filter_chain = FILTER_RESULTS_PROMPT | self.llm
 
         except Exception as e:
-            print(f"Azure OpenAI 初始化失敗: {e}")
+            logger.error("Azure OpenAI 初始化失敗: %s", e)
             self.llm = None
 
         self.time_patterns = self._get_dynamic_time_patterns()
@@ -148,49 +287,62 @@ class NaturalLanguageQueryParser:
             "task": ["task", "任務", "工作項目"],
         })
 
-    def _get_dynamic_time_patterns(self) -> Dict[str, Any]:
-        """動態生成時間模式，只包含當年和去年"""
+        # 基本解析時不當作關鍵字的詞彙：時間用語、意圖用語與通用詞彙（固定資料，只建立一次）
+        excluded_keywords = set(COMMON_WORDS)
+        for pattern, _ in self.time_patterns:
+            cleaned_pattern = re.sub(r'[^w\s]', '', pattern.pattern)
+            excluded_keywords.update(cleaned_pattern.lower().split())
+        for pattern_list in self.intent_patterns.values():
+            excluded_keywords.update(k.lower() for k in pattern_list)
+        self._excluded_keywords = frozenset(excluded_keywords)
+
+        # 意圖用語一次掃描：以前瞻比對在每個位置各試一次，重疊的用語（如「工作項目」與「項目」）不會互相吃掉
+        self._intent_categories_by_keyword: Dict[str, Set[str]] = {}
+        for category, pattern_list in self.intent_patterns.items():
+            for keyword in pattern_list:
+                self._intent_categories_by_keyword.setdefault(keyword.lower(), set()).add(category)
+        alternation = '|'.join(
+            re.escape(k) for k in sorted(self._intent_categories_by_keyword, key=len, reverse=True)
+        )
+        self._intent_scanner = re.compile(f'(?=({alternation}))')
+
+    def _get_dynamic_time_patterns(self) -> List[Tuple[re.Pattern, Callable]]:
+        """動態生成時間模式（預先編譯，依序比對），年份只包含當年和去年"""
         now = datetime.now()
         current_year = now.year
         last_year = now.year - 1
 
-        patterns = {
-            r'(\d{4})\s*Q([1-4])': self._parse_quarter,
-            r'(\d{4})\s*年\s*(\d{1,2})\s*月': self._parse_year_month,
-            r'(\d{1,2})\s*月': self._parse_month,
-            r'今天': self._parse_today,
-            r'昨天': self._parse_yesterday,
-            r'這週|本週': self._parse_this_week,
-            r'上週': self._parse_last_week,
-            r'這個月|本月': self._parse_this_month,
-            r'上個月': self._parse_last_month,
-            r'今年|本年': self._parse_this_year,
-            r'去年': self._parse_last_year,
-        }
-
-        # 動態添加當前年份和去年份的單獨解析
-        patterns[str(current_year)] = lambda: self._parse_specific_year(current_year)
-        patterns[str(last_year)] = lambda: self._parse_specific_year(last_year)
-
-        return patterns
-
-    def _parse_today(self, groups: Tuple = ()) -> Tuple[str, str]:
-        now = datetime.now()
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
-
-    def _parse_yesterday(self, groups: Tuple = ()) -> Tuple[str, str]:
-        yesterday = datetime.now() - timedelta(days=1)
-        start = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-        end = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
-        return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
-
-    def _parse_quarter(self, groups: Tuple[str, ...]) -> Tuple[str, str]:
+        patterns = [
+            (r'(\d{4})\s*Q([1-4])', self._parse_quarter),
+            (r'(\d{4})\s*年\s*(\d{1,2})\s*月', self._parse_year_month),
+            (r'(\d{1,2})\s*月', self._parse_month),
+            (r'今天', self._parse_today),
+            (r'昨天', self._parse_yesterday),
+            (r'這週|本週', self._parse_this_week),
+            (r'上週', self._parse_last_week),
+            (r'這個月|本月', self._parse_this_month),
+            (r'上個月', self._parse_last_month),
+            (r'今年|本年', self._parse_this_year),
+            (r'去年', self._parse_last_year),
+            # 動態添加當前年份和去年份的單獨解析
+            (str(current_year), lambda groups, now, year=current_year: self._parse_specific_year(year, now)),
+            (str(last_year), lambda groups, now, year=last_year: self._parse_specific_year(year, now)),
+        ]
+
+        return [(re.compile(pattern, re.IGNORECASE), parser_func) for pattern, parser_func in patterns]
+
+    def _parse_today(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
+        today = now.strftime('%Y-%m-%d')
+        return today, today
+
+    def _parse_yesterday(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
+        yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d')
+        return yesterday, yesterday
+
+    def _parse_quarter(self, groups: Tuple[str, ...], now: datetime) -> Tuple[str, str]:
         """解析季度"""
         year, quarter = int(groups[0]), int(groups[1])
-        now_year = datetime.now().year
-        if year not in [now_year, now_year - 1]:
+        if year not in [now.year, now.year - 1]:
             return None # 只允許當年和去年
 
         quarter_starts = {
@@ -208,301 +360,339 @@ class NaturalLanguageQueryParser:
 
         return start_date, end_date
 
-    def _parse_year_month(self, groups: Tuple[str, ...]) -> Tuple[str, str]:
+    def _parse_year_month(self, groups: Tuple[str, ...], now: datetime) -> Tuple[str, str]:
         """解析年月"""
         year, month = int(groups[0]), int(groups[1])
-        now_year = datetime.now().year
-        if year not in [now_year, now_year - 1]:
+        if year not in [now.year, now.year - 1]:
             return None # 只允許當年和去年
 
-        start = arrow.get(year, month, 1)
-        end = start.ceil('month')
-        return start.format('YYYY-MM-DD'), end.format('YYYY-MM-DD')
+        return _month_range(year, month)
 
-    def _parse_month(self, groups: Tuple[str, ...]) -> Tuple[str, str]:
+    def _parse_month(self, groups: Tuple[str, ...], now: datetime) -> Tuple[str, str]:
         """解析月份（當前年或去年）"""
         month = int(groups[0])
-        current_year = datetime.now().year
-
-        # 嘗試解析為當前年份
-        start_current = arrow.get(current_year, month, 1)
-        end_current = start_current.ceil('month')
-        if datetime.now().date() >= start_current.date(): # 如果月份在當前年份是合理的
-             return start_current.format('YYYY-MM-DD'), end_current.format('YYYY-MM-DD')
 
-        # 嘗試解析為去年份
-        last_year = current_year - 1
-        start_last = arrow.get(last_year, month, 1)
-        end_last = start_last.ceil('month')
-        return start_last.format('YYYY-MM-DD'), end_last.format('YYYY-MM-DD')
+        # 月份在當前年份已開始時解析為當前年份，否則解析為去年
+        if now.month >= month:
+            return _month_range(now.year, month)
+        return _month_range(now.year - 1, month)
 
-    def _parse_this_year(self, groups: Tuple = ()) -> Tuple[str, str]:
+    def _parse_this_year(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
         """解析今年"""
-        current_year = datetime.now().year
-        return f"{current_year}-01-01", f"{current_year}-12-31"
+        return f"{now.year}-01-01", f"{now.year}-12-31"
 
-    def _parse_last_year(self, groups: Tuple = ()) -> Tuple[str, str]:
+    def _parse_last_year(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
         """解析去年"""
-        last_year = datetime.now().year - 1
+        last_year = now.year - 1
         return f"{last_year}-01-01", f"{last_year}-12-31"
 
-    def _parse_specific_year(self, year: int) -> Tuple[str, str]:
+    def _parse_specific_year(self, year: int, now: datetime) -> Tuple[str, str]:
         """解析特定年份（當年或去年）"""
-        now_year = datetime.now().year
-        if year not in [now_year, now_year - 1]:
+        if year not in [now.year, now.year - 1]:
             return None
         return f"{year}-01-01", f"{year}-12-31"
 
-    def _parse_this_month(self, groups: Tuple = ()) -> Tuple[str, str]:
+    def _parse_this_month(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
         """解析本月"""
-        now = arrow.now()
-        start = now.floor('month')
-        end = now.ceil('month')
-        return start.format('YYYY-MM-DD'), end.format('YYYY-MM-DD')
+        return _month_range(now.year, now.month)
 
-    def _parse_last_month(self, groups: Tuple = ()) -> Tuple[str, str]:
+    def _parse_last_month(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
         """解析上月"""
-        now = arrow.now().shift(months=-1)
-        start = now.floor('month')
-        end = now.ceil('month')
-        return start.format('YYYY-MM-DD'), end.format('YYYY-MM-DD')
-
-    def _parse_this_week(self, groups: Tuple = ()) -> Tuple[str, str]:
-        """解析本週"""
-        now = arrow.now()
-        start = now.floor('week')
-        end = now.ceil('week')
-        return start.format('YYYY-MM-DD'), end.format('YYYY-MM-DD')
-
-    def _parse_last_week(self, groups: Tuple = ()) -> Tuple[str, str]:
+        if now.month == 1:
+            return _month_range(now.year - 1, 12)
+        return _month_range(now.year, now.month - 1)
+
+    def _parse_this_week(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
+        """解析本週（週一至週日）"""
+        return _week_range(now.date())
+
+    def _parse_last_week(self, groups: Tuple, now: datetime) -> Tuple[str, str]:
         """解析上週"""
-        now = arrow.now().shift(weeks=-1)
-        start = now.floor('week')
-        end = now.ceil('week')
-        return start.format('YYYY-MM-DD'), end.format('YYYY-MM-DD')
+        return _week_range(now.date() - timedelta(weeks=1))
 
     def _extract_time_range(self, query: str) -> Optional[Tuple[str, str]]:
         """提取時間範圍"""
-        query_lower = query.lower()
+        matched = self._match_time_range(query.lower())
+        return matched[0] if matched else None
 
-        for pattern_str, parser_func in self.time_patterns.items():
-            if re.search(pattern_str, query_lower):
-                time_range = parser_func(re.search(pattern_str, query_lower).groups() if re.search(pattern_str, query_lower).groups() else ())
+    def _match_time_range(self, query_lower: str) -> Optional[Tuple[Tuple[str, str], Tuple[int, int]]]:
+        """提取時間範圍，並回傳時間描述在查詢中的位置"""
+        # 「現在」時間每次查詢只取一次，傳給各個解析函式
+        now = datetime.now()
+        for pattern, parser_func in self.time_patterns:
+            match = pattern.search(query_lower)
+            if match:
+                time_range = parser_func(match.groups(), now)
                 if time_range:
-                    return time_range
+                    return time_range, match.span()
         return None
 
+    def _build_user_conditions(self, user_conditions: Dict) -> List[str]:
+        """將勾選的用戶條件轉為 JQL 條件"""
+        conditions = []
+        if user_conditions.get("assignee"):
+            conditions.append(f"assignee = '{self.jira_username}'")
+        if user_conditions.get("reporter"):
+            conditions.append(f"reporter = '{self.jira_username}'")
+        # 移除 commentedBy 因為 Jira 實例不支持此語法
+        # if user_conditions.get("commenter"):
+        #     conditions.append(f"commentedBy = '{self.jira_username}'")
+        return conditions
+
+    def _split_time_range(self, query_text: str) -> Tuple[Optional[Dict[str, str]], str]:
+        """取出查詢中的時間範圍，回傳 (時間範圍, 去掉時間描述後的小寫查詢)"""
+        remainder = query_text.lower()
+        matched = self._match_time_range(remainder)
+        if not matched:
+            return None, remainder
+        (start, end), (span_start, span_end) = matched
+        return {"start": start, "end": end}, remainder[:span_start] + remainder[span_end:]
+
+    def is_trivial_query(self, query_text: str) -> bool:
+        """查詢是否只有時間描述與固定用語（沒有關鍵字、狀態或排除條件），這類查詢的結果不需要 LLM 篩選"""
+        _, remainder = self._split_time_range(query_text)
+        return not _FILLER_RE.sub('', remainder)
+
+    def _fast_parse(self, query_text: str, year: Optional[str], user_conditions: Dict) -> Optional[QueryIntent]:
+        """只有時間與「我的任務」這類固定用語的查詢不需要 LLM，直接組出與 LLM 分析相同格式的結果
+
+        去掉時間描述與固定用語後仍有其他文字（可能是關鍵字、專案或排除條件）時回傳 None。
+        """
+        time_range, remainder = self._split_time_range(query_text)
+        if _FILLER_RE.sub('', remainder):
+            return None
+
+        # 確保使用傳入的年份
+        if year:
+            time_range = {"year": year, "start": f"{year}-01-01", "end": f"{year}-12-31"}
+
+        return QueryIntent(
+            intent_type="search_issues",
+            confidence=0.8,
+            entities={
+                "main_keyword_conditions": [],
+                "related_keyword_conditions": [],
+                "user_conditions": self._build_user_conditions(user_conditions),
+                "time_range": time_range,
+                "project": None
+            }
+        )
+
     def _get_llm_expanded_keywords(self, text: str) -> List[str]:
         """使用 LLM 處理文本，生成相關的關鍵字或 JQL 片段"""
         if not self.llm:
-            print("警告: OpenAI API key 未配置或 LangChain 不可用，無法進行智能關鍵字擴展。")
+            logger.warning("OpenAI API key 未配置或 LangChain 不可用，無法進行智能關鍵字擴展。")
             return [text] # 返回原始文本作為關鍵字
 
-        prompt_template = PromptTemplate(
-            input_variables=["text"],
-            template="""
-            根據以下查詢，提取相關的 Jira 任務關鍵字。
-            
-            **重要注意事項：**
-            1. 忽略排序相關的詞語（如：最久、最新、最近、最長時間、處理最久等）
-            2. **不要包含通用詞彙**：任務、工作、項目、Task、Work、Project、Issue、Bug、Feature等
-            3. 只提取具體的技術關鍵字、功能名稱、產品名稱或業務領域詞彙
-            4. 如果查詢太通用或沒有具體關鍵字，返回空字串
+        # temperature=0，同一段文字的擴展結果固定；忽略前後空白差異
+        cache_key = text.strip()
+        cached = self._cache_get(self._keyword_cache, cache_key)
+        if cached is not None:
+            return list(cached)
+
+        try:
+            response = self._expand_chain.invoke({"text": text}).content
+            # 處理 LLM 返回的關鍵字，過濾空字串和通用詞彙
+            keywords = [k.strip() for k in response.split(',') if k.strip()]
+            keywords = [k for k in keywords if k.lower() not in _EXPANSION_STOPWORDS]
 
-            **範例：**
-            輸入: "跟 iOS 有關且處理最久的"
-            輸出: "iOS, iPhone, iPad, Swift, Objective-C, Xcode, 手機, app, 移動開發"
+            self._cache_set(self._keyword_cache, cache_key, tuple(keywords))
+            return keywords
+        except Exception as e:
+            logger.warning("LLM 處理關鍵字失敗: %s", e)
+            return [] # 失敗時返回空列表，不再使用原始文本
 
-            輸入: "排行榜以外的工作"
-            輸出: "用戶管理, 登入, 註冊, 設定, 支付, 通知, 數據分析, API, 後台管理"
+    def parse(self, query: str | dict, fallback: bool = True) -> Optional[QueryIntent]:
+        """解析查詢意圖
 
-            輸入: "提升用戶留存率"
-            輸出: "用戶留存, 用戶體驗, 活躍用戶, 產品優化, 數據分析, 報告, 行為分析, 儀表板, 忠誠度, app, 功能改進"
-            
-            輸入: "我留言最多的 Task"
-            輸出: ""
+        fallback 為 False 時不改用基本解析，未設定 LLM 或 LLM 解析失敗時回傳 None，
+        呼叫端可藉此只保存 LLM 的解析結果
+        """
+        query_text, year, user_conditions = self._unpack_query(query)
 
-            目標/任務/查詢: {text}
+        if not self.llm:
+            return self.basic_parse(query_text) if fallback else None
 
-            關鍵字:"""
-        )
+        # 沒有關鍵字的簡單查詢（例如「我 2025 Q1 的工作」）不必呼叫 LLM
+        intent = self._fast_parse(query_text, year, user_conditions)
+        if intent is not None:
+            return intent
+
+        cache_key = self._parse_cache_key(query_text, year, user_conditions)
+        cached = self._cache_get(self._parse_cache, cache_key)
+        if cached is not None:
+            return cached.model_copy(deep=True)
 
-        chain = LLMChain(llm=self.llm, prompt=prompt_template)
         try:
-            response = chain.run(text=text)
-            # 處理 LLM 返回的關鍵字，過濾空字串和通用詞彙
-            keywords = [k.strip() for k in response.split(',') if k.strip()]
-            
-            # 過濾通用詞彙
-            common_words = {
-                '任務', '工作', '項目', '問題', '需求', '功能', '系統', '平台',
-                'task', 'work', 'project', 'issue', 'feature', 'bug', 'system', 'platform'
-            }
-            keywords = [k for k in keywords if k.lower() not in common_words]
-            
-            return keywords
+            # 使用 LLM 分析查詢
+            analysis_result = self.chain.invoke({"query": self._analysis_context(query_text, year, user_conditions)})
+            intent = self._intent_from_analysis(analysis_result.content, year, user_conditions)
         except Exception as e:
-            print(f"LLM 處理關鍵字失敗: {e}")
-            return [] # 失敗時返回空列表，不再使用原始文本
+            logger.warning("查詢分析失敗，改用基本解析: %s", e)
+            return self.basic_parse(query_text) if fallback else None
 
-    def parse(self, query: str | dict) -> QueryIntent:
-        """解析查詢意圖"""
-        if isinstance(query, dict):
-            query_text = query["text"]
-            year = query.get("year")
-            user_conditions = query.get("user_conditions", {})
-        else:
-            query_text = query
-            year = None
-            user_conditions = {}
+        self._cache_set(self._parse_cache, cache_key, intent.model_copy(deep=True))
+        return intent
+
+    async def aparse(self, query: str | dict, fallback: bool = True) -> Optional[QueryIntent]:
+        """parse 的非同步版本：等待 LLM 回應時不佔用執行緒，多個查詢可用 asyncio.gather 同時解析
+
+        fallback 的行為與 parse 相同
+        """
+        query_text, year, user_conditions = self._unpack_query(query)
 
         if not self.llm:
-            return self._basic_parse(query_text)
+            return self.basic_parse(query_text) if fallback else None
+
+        intent = self._fast_parse(query_text, year, user_conditions)
+        if intent is not None:
+            return intent
+
+        cache_key = self._parse_cache_key(query_text, year, user_conditions)
+        cached = self._cache_get(self._parse_cache, cache_key)
+        if cached is not None:
+            return cached.model_copy(deep=True)
 
         try:
-            # 構建包含完整上下文的提示
-            context = f"""查詢內容: {query_text}
+            analysis_result = await self.chain.ainvoke(
+                {"query": self._analysis_context(query_text, year, user_conditions)}
+            )
+            intent = self._intent_from_analysis(analysis_result.content, year, user_conditions)
+        except Exception as e:
+            logger.warning("查詢分析失敗，改用基本解析: %s", e)
+            if not fallback:
+                return None
+            # 基本解析的關鍵字擴展仍是同步呼叫，放到執行緒中避免阻塞事件迴圈
+            return await asyncio.to_thread(self.basic_parse, query_text)
+
+        self._cache_set(self._parse_cache, cache_key, intent.model_copy(deep=True))
+        return intent
+
+    def _cache_get(self, cache: TTLCache, key: str):
+        """讀取快取；停用快取時一律視為未命中"""
+        if not self.enable_cache:
+            return None
+        with self._cache_lock:
+            return cache.get(key)
+
+    def _cache_set(self, cache: TTLCache, key: str, value):
+        """寫入快取；停用快取時不寫入"""
+        if self.enable_cache:
+            with self._cache_lock:
+                cache[key] = value
+
+    @staticmethod
+    def _unpack_query(query: str | dict) -> Tuple[str, Optional[str], Dict]:
+        """取出查詢文字、指定年份與用戶條件（網頁介面傳入 dict，命令列傳入字串）"""
+        if isinstance(query, dict):
+            return query["text"], query.get("year"), query.get("user_conditions", {})
+        return query, None, {}
+
+    @staticmethod
+    def _parse_cache_key(query_text: str, year: Optional[str], user_conditions: Dict) -> str:
+        """temperature 為 0，相同的查詢內容與條件會得到相同的分析結果"""
+        return hashlib.sha1(
+            json.dumps([query_text, year, user_conditions], sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def _analysis_context(query_text: str, year: Optional[str], user_conditions: Dict) -> str:
+        """構建包含完整上下文的提示"""
+        return f"""查詢內容: {query_text}
 年份: {year if year else '未指定'}
 需要包含:
 - 指派給用戶的任務: {user_conditions.get('assignee', False)}
 - 用戶創建的任務: {user_conditions.get('reporter', False)}
 - 用戶評論過的任務: {user_conditions.get('commenter', False)}"""
 
-            # 使用 LLM 分析查詢
-            analysis_result = self.chain.invoke({"query": context})
-            content = analysis_result.content.strip()
-            if content.startswith('```'):
-                content = '\n'.join(content.split('\n')[1:-1])
-
-            print(f"清理後的 LLM 分析結果: {content}")
-
-            parsed = json.loads(content)
-            print(f"解析後的 JSON 結果: {parsed}")
-
-            # 確保使用傳入的年份
-            if year:
-                parsed["time"] = {
-                    "year": year,
-                    "start": f"{year}-01-01",
-                    "end": f"{year}-12-31"
-                }
+    def _intent_from_analysis(self, content: str, year: Optional[str], user_conditions: Dict) -> QueryIntent:
+        """將 LLM 的分析結果轉為查詢意圖"""
+        content = strip_code_fence(content)
 
-            # 確保使用傳入的用戶條件
-            parsed["user_conditions"] = user_conditions
-
-            # 構建查詢條件
-            def generate_flexible_keyword_conditions(keywords):
-                """為關鍵字生成靈活的搜尋條件，JQL 階段使用寬鬆搜尋，重點搜尋單個關鍵詞"""
-                conditions = []
-                all_words = set()  # 收集所有單詞
-                
-                # 通用詞彙過濾列表
-                common_words = {
-                    # 中文通用詞
-                    '任務', '工作', '項目', '問題', '需求', '功能', '系統', '平台',
-                    '管理', '開發', '設計', '測試', '修復', '優化', '更新', '維護',
-                    '實現', '完成', '處理', '解決', '改進', '增加', '減少', '提升',
-                    # 英文通用詞
-                    'task', 'work', 'project', 'issue', 'feature', 'bug', 'system', 'platform',
-                    'management', 'development', 'design', 'test', 'fix', 'optimize', 'update', 'maintain',
-                    'implement', 'complete', 'process', 'solve', 'improve', 'add', 'reduce', 'enhance',
-                    # 其他通用詞
-                    'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'from', 'of', 'is', 'are',
-                    '的', '和', '或', '在', '於', '為', '與', '由', '從', '是', '有', '沒有'
-                }
-                
-                for keyword in keywords:
-                    # 如果是複合關鍵字，拆分成單詞
-                    if ' ' in keyword:
-                        words = keyword.split()
-                        for word in words:
-                            if len(word) > 2 and word.lower() not in common_words:  # 過濾通用詞
-                                all_words.add(word)
-                    else:
-                        # 單個關鍵字
-                        if len(keyword) > 2 and keyword.lower() not in common_words:  # 過濾通用詞
-                            all_words.add(keyword)
-                
-                # 為每個單詞生成大小寫變體的搜尋條件
-                for word in all_words:
-                    word_variants = [
-                        word,
-                        word.upper(),
-                        word.lower(),
-                        word.capitalize(),
-                        word.title()
-                    ]
-                    
-                    # 去重
-                    word_variants = list(set(word_variants))
-                    
-                    # 生成搜尋條件（使用 text ~ 搜尋所有內容）
-                    variant_conditions = []
-                    for variant in word_variants:
-                        variant_conditions.append(f"text ~ '{variant}'")
-                    
-                    # 將所有變體用 OR 連接
-                    if variant_conditions:
-                        conditions.append(f"({' OR '.join(variant_conditions)})")
-                
-                print(f"關鍵字搜尋單詞: {list(all_words)}")
-                return conditions
-
-            conditions = {
-                "main_keyword_conditions": generate_flexible_keyword_conditions(
-                    parsed.get("keywords", {}).get("main", [])
-                ),
-                "related_keyword_conditions": generate_flexible_keyword_conditions(
-                    parsed.get("keywords", {}).get("related", [])
-                ),
-                "user_conditions": [],
-                "time_range": parsed.get("time"),
-                "project": parsed.get("project") # 新增項目名稱條件
+        logger.debug("清理後的 LLM 分析結果: %s", content)
+
+        parsed = ParsedQuery.model_validate_json(content)
+        logger.debug("解析後的 JSON 結果: %s", parsed)
+
+        # 確保使用傳入的年份
+        if year:
+            time_range = {
+                "year": year,
+                "start": f"{year}-01-01",
+                "end": f"{year}-12-31"
             }
+        else:
+            # LLM 沒有給出時間時維持 None，不產生 start/end 皆為 None 的字典
+            time_range = (parsed.time.model_dump(exclude_none=True) or None) if parsed.time else None
+
+        # 構建查詢條件
+        def generate_flexible_keyword_conditions(keywords):
+            """為關鍵字生成靈活的搜尋條件，JQL 階段使用寬鬆搜尋，重點搜尋單個關鍵詞"""
+            conditions = []
+
+            # 複合關鍵字拆成單詞並過濾通用詞；以 dict 去重並保留順序，相同輸入產生相同的 JQL（快取才能命中）
+            all_words = dict.fromkeys(
+                word
+                for keyword in keywords
+                for word in keyword.split()
+                if len(word) > 2 and word.lower() not in COMMON_WORDS
+            )
 
-            print(f"構建的關鍵字條件:")
-            print(f"  main_keyword_conditions: {conditions['main_keyword_conditions']}")
-            print(f"  related_keyword_conditions: {conditions['related_keyword_conditions']}")
-
-            # 添加用戶條件
-            if user_conditions.get("assignee"):
-                conditions["user_conditions"].append(f"assignee = '{self.jira_username}'")
-            if user_conditions.get("reporter"):
-                conditions["user_conditions"].append(f"reporter = '{self.jira_username}'")
-            # 移除 commentedBy 因為 Jira 實例不支持此語法
-            # if user_conditions.get("commenter"):
-            #     conditions["user_conditions"].append(f"commentedBy = '{self.jira_username}'")
-
-            # 提取排除性查詢信息
-            exclusion_info = parsed.get("exclusion", {})
-            is_exclusion = exclusion_info.get("is_exclusion", False)
-            excluded_keywords = exclusion_info.get("excluded_keywords", [])
-            
-            print(f"排除性查詢檢測: is_exclusion={is_exclusion}, excluded_keywords={excluded_keywords}")
+            # 為每個單詞生成大小寫變體的搜尋條件（使用 text ~ 搜尋所有內容），所有變體用 OR 連接
+            for word in all_words:
+                variants = dict.fromkeys((word, word.upper(), word.lower(), word.capitalize(), word.title()))
+                conditions.append("(" + " OR ".join(f"text ~ '{variant}'" for variant in variants) + ")")
             
-            return QueryIntent(
-                intent_type="search_issues",
-                confidence=0.9,
-                entities=conditions,
-                is_exclusion=is_exclusion,
-                excluded_keywords=excluded_keywords
-            )
+            logger.debug("關鍵字搜尋單詞: %s", list(all_words))
+            return conditions
+
+        conditions = {
+            "main_keyword_conditions": generate_flexible_keyword_conditions(parsed.keywords.main),
+            "related_keyword_conditions": generate_flexible_keyword_conditions(parsed.keywords.related),
+            "user_conditions": [],
+            "time_range": time_range,
+            "project": parsed.project # 新增項目名稱條件
+        }
 
-        except Exception as e:
-            print(f"查詢分析失敗: {e}")
-            return self._basic_parse(query_text)
+        logger.debug("構建的關鍵字條件: main_keyword_conditions=%s, related_keyword_conditions=%s",
+                     conditions['main_keyword_conditions'], conditions['related_keyword_conditions'])
+
+        # 添加用戶條件
+        conditions["user_conditions"] = self._build_user_conditions(user_conditions)
+
+        # 提取排除性查詢信息
+        is_exclusion = parsed.exclusion.is_exclusion
+        excluded_keywords = parsed.exclusion.excluded_keywords
+        
+        logger.debug("排除性查詢檢測: is_exclusion=%s, excluded_keywords=%s", is_exclusion, excluded_keywords)
+        
+        return QueryIntent(
+            intent_type="search_issues",
+            confidence=0.9,
+            entities=conditions,
+            is_exclusion=is_exclusion,
+            excluded_keywords=excluded_keywords
+        )
+
+    def filter_results(self, original_query: str, jira_results: List[Dict],
+                       fallback: bool = True) -> Optional[List[Dict]]:
+        """以 LLM 篩選並依相關性排序結果
 
-    def filter_results(self, original_query: str, jira_results: List[Dict]) -> List[Dict]:
+        無法篩選（未設定 LLM、沒有結果或 LLM 篩選失敗）時回傳原始結果；
+        fallback 為 False 時改為回傳 None
+        """
         if not self.llm or not jira_results:
-            return jira_results
+            return jira_results if fallback else None
 
         try:
-            formatted_results = "\n".join([
-                f"項目 {i+1}:\n"
-                f"Key: {item['key']}\n"
-                f"標題: {item['summary']}\n"
-                f"描述: {item.get('description', 'N/A')}\n"
-                for i, item in enumerate(jira_results)
+            # 以 JSON 序列化任務清單，特殊字元一定會正確跳脫，LLM 也較容易對應 key
+            formatted_results = json_utils.dumps([
+                {
+                    "key": item["key"],
+                    "summary": item.get("summary"),
+                    "description": item.get("description"),
+                }
+                for item in jira_results
             ])
 
             filter_result = self.filter_chain.invoke({
@@ -510,37 +700,42 @@ class NaturalLanguageQueryParser:
                 "jira_results": formatted_results
             })
 
-            parsed_filter = json.loads(filter_result.content)  # 從 chat response 獲取內容
-            relevant_issues = parsed_filter.get("relevant_issues", [])
+            parsed_filter = FilterResult.model_validate_json(strip_code_fence(filter_result.content))
 
             # 根據相關性分數排序結果
             sorted_results = sorted(
-                relevant_issues,
-                key=lambda x: x.get("relevance_score", 0),
+                parsed_filter.relevant_issues,
+                key=attrgetter("relevance_score"),
                 reverse=True
             )
 
-            # 重新組織結果
+            # 重新組織結果；以複本加上相關性欄位，不修改傳入的結果（可能是其他查詢共用的快取內容）
+            by_key = {item["key"]: item for item in jira_results}
             filtered_results = []
             for relevant in sorted_results:
-                issue_key = relevant["key"]
-                original_item = next(
-                    (item for item in jira_results if item["key"] == issue_key),
-                    None
-                )
+                original_item = by_key.get(relevant.key)
                 if original_item:
-                    original_item["relevance_score"] = relevant["relevance_score"]
-                    original_item["relevance_reason"] = relevant["reason"]
-                    filtered_results.append(original_item)
+                    filtered_results.append({
+                        **original_item,
+                        "relevance_score": relevant.relevance_score,
+                        "relevance_reason": relevant.reason
+                    })
 
             return filtered_results
 
         except Exception as e:
-            print(f"結果篩選失敗: {e}")
-            return jira_results
-
-    def _basic_parse(self, query: str) -> QueryIntent:
-        """基本的查詢解析（作為備用）"""
+            logger.warning("結果篩選失敗，回傳原始結果: %s", e)
+            return jira_results if fallback else None
+
+    def _match_intent_categories(self, query_lower: str) -> Set[str]:
+        """一次掃描查詢，回傳出現過的意圖類別"""
+        categories = set()
+        for match in self._intent_scanner.finditer(query_lower):
+            categories |= self._intent_categories_by_keyword[match.group(1)]
+        return categories
+
+    def basic_parse(self, query: str) -> QueryIntent:
+        """基本的查詢解析（作為備用）：不經 LLM 分析查詢，供 LLM 未設定或解析失敗時使用"""
         query_lower = query.lower()
         entities = {}
         intent_type = "search_issues"
@@ -553,14 +748,16 @@ class NaturalLanguageQueryParser:
             intent_type = "filter_by_date"
             confidence = 0.7 # 提高置信度
 
+        intent_categories = self._match_intent_categories(query_lower)
+
         # 2. 檢測用戶相關查詢
-        if any(keyword in query_lower for keyword in self.intent_patterns["user"]):
+        if "user" in intent_categories:
             entities['assignee'] = 'currentUser()'
             intent_type = "get_user_issues"
             confidence = max(confidence, 0.7)
 
         # 3. 檢測狀態過濾
-        if any(keyword in query_lower for keyword in self.intent_patterns["status"]):
+        if "status" in intent_categories:
             # 更精確地判斷狀態
             if "完成" in query_lower or "done" in query_lower:
                 entities['status'] = ["Done"]
@@ -592,35 +789,9 @@ class NaturalLanguageQueryParser:
         if not self.llm and not entities.get('keywords'): # LLM 不可用且沒有其他關鍵字時，才做簡單的單詞拆分
             all_keywords = []
             words = query.split()
-            excluded_keywords = set()
-            
-            # 添加時間相關的排除詞彙
-            for pattern in self.time_patterns.keys():
-                cleaned_pattern = re.sub(r'[^w\s]', '', pattern)
-                excluded_keywords.update(set(cleaned_pattern.lower().split()))
-
-            # 添加意圖相關的排除詞彙
-            for pattern_list in self.intent_patterns.values():
-                excluded_keywords.update(set(k.lower() for k in pattern_list))
-            
-            # 添加通用詞彙過濾列表，避免將通用詞當作關鍵字
-            common_words = {
-                # 中文通用詞
-                '任務', '工作', '項目', '問題', '需求', '功能', '系統', '平台',
-                '管理', '開發', '設計', '測試', '修復', '優化', '更新', '維護',
-                '實現', '完成', '處理', '解決', '改進', '增加', '減少', '提升',
-                # 英文通用詞
-                'task', 'work', 'project', 'issue', 'feature', 'bug', 'system', 'platform',
-                'management', 'development', 'design', 'test', 'fix', 'optimize', 'update', 'maintain',
-                'implement', 'complete', 'process', 'solve', 'improve', 'add', 'reduce', 'enhance',
-                # 其他通用詞
-                'the', 'and', 'or', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'from', 'of', 'is', 'are',
-                '的', '和', '或', '在', '於', '為', '與', '由', '從', '是', '有', '沒有'
-            }
-            excluded_keywords.update(common_words)
 
             for word in words:
-                if word.lower() not in excluded_keywords and len(word) > 1:
+                if word.lower() not in self._excluded_keywords and len(word) > 1:
                     all_keywords.append(word)
 
             if 'keywords' in entities:
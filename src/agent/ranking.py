@@ -0,0 +1,71 @@
+"""
+本地排序：在送進 LLM 篩選前，以 BM25 快速縮小候選集合
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+
+# 英數字以單字為單位；中文沒有空白分詞，以相鄰兩字（bigram）近似詞彙
+_ASCII_WORD_RE = re.compile(r'[a-z0-9]+')
+_CJK_RUN_RE = re.compile(r'[一-鿿]+')
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """將文字切為英數字單字與中文 bigram"""
+    text = (text or '').lower()
+    tokens = _ASCII_WORD_RE.findall(text)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _issue_text(issue: Dict) -> str:
+    return f"{issue.get('summary') or ''} {issue.get('description') or ''}"
+
+
+def bm25_scores(query: str, documents: List[List[str]]) -> List[float]:
+    """計算查詢對每份已分詞文件的 BM25 分數"""
+    query_terms = set(tokenize(query))
+    if not documents or not query_terms:
+        return [0.0] * len(documents)
+
+    doc_count = len(documents)
+    avg_length = sum(len(doc) for doc in documents) / doc_count or 1.0
+    term_counts = [Counter(doc) for doc in documents]
+
+    idf = {}
+    for term in query_terms:
+        df = sum(1 for counts in term_counts if term in counts)
+        idf[term] = math.log((doc_count - df + 0.5) / (df + 0.5) + 1)
+
+    scores = []
+    for doc, counts in zip(documents, term_counts):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avg_length)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if tf:
+                score += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+
+def bm25_top_k(query: str, issues: List[Dict], k: int = 40) -> List[Dict]:
+    """保留與查詢最相關的前 k 筆任務，回傳時維持原本的順序
+
+    同分（包含查詢與任務完全沒有共同詞彙）時以原本順序優先，
+    因此純時間或人員條件的查詢會保留 Jira 排序最前面的 k 筆。
+    """
+    if len(issues) <= k:
+        return list(issues)
+
+    scores = bm25_scores(query, [tokenize(_issue_text(issue)) for issue in issues])
+    ranked = sorted(range(len(issues)), key=lambda i: -scores[i])[:k]
+    return [issues[i] for i in sorted(ranked)]
@@ -0,0 +1,277 @@
+"""
+語意快取：以查詢的語意相似度重用先前的 LLM 解析與篩選結果
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 查詢以中文為主，預設使用多語系模型；all-MiniLM-L6-v2 對中文幾乎全部輸出 [UNK]
+DEFAULT_EMBEDDING_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.jira-agentic-cache', 'semantic_cache.db')
+DEFAULT_TTL = 3600
+
+# 語意相近但條件不同的查詢（年份、英文關鍵字、排除語氣）不可互相命中
+_ASCII_TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9\-_.]*')
+_NEGATION_MARKERS = ('無關', '以外', '除了', '不包括', '不是', '非', 'not', 'except', 'without')
+# 相對時間與排序用語決定解析出的時間範圍與排序方式（本月/上個月、最新/最久），同樣必須一致
+_TIME_MARKERS = ('今天', '昨天', '這週', '本週', '上週', '這個月', '本月', '上個月', '今年', '本年', '去年')
+_SORT_MARKERS = ('最新', '最近', '新建', '最久', '最長', '最多', '最少', '留言', '評論', '討論')
+
+# 正規化時去除句讀；英文句點只在不接字元時去除，避免「v1.2」變成「v12」
+_PUNCT_RE = re.compile(r'[，。！？、,!?]|\.(?!\w)')
+_WS_RE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    """正規化查詢文字，作為快取鍵（忽略大小寫、空白與句讀差異）"""
+    return _WS_RE.sub(' ', _PUNCT_RE.sub('', query.lower())).strip()
+
+
+def results_namespace(prefix: str, results: Iterable[Dict]) -> str:
+    """以候選結果的 key 集合產生快取命名空間，候選集合相同才重用排序結果"""
+    keys = ','.join(sorted(r['key'] for r in results))
+    return f"{prefix}:{hashlib.sha256(keys.encode()).hexdigest()}"
+
+
+def _query_signature(normalized: str) -> Tuple:
+    """取得查詢中必須完全一致的部分"""
+    tokens = tuple(sorted(set(_ASCII_TOKEN_RE.findall(normalized))))
+    negations = tuple(m for m in _NEGATION_MARKERS if m in normalized)
+    conditions = tuple(m for m in _TIME_MARKERS + _SORT_MARKERS if m in normalized)
+    return tokens, negations, conditions
+
+
+@dataclass
+class _CacheEntry:
+    namespace: str
+    query: str
+    signature: Tuple
+    vector: Any
+    value: Any
+    expires_at: float
+
+
+class SemanticCache:
+    """語意快取：精確比對失敗時，以嵌入向量的餘弦相似度尋找相近查詢"""
+
+    def __init__(self, threshold: float = 0.92, ttl: int = DEFAULT_TTL, max_entries: int = 1024,
+                 db_path: str = None, use_embeddings: bool = True):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        db_path = db_path if db_path is not None else os.getenv('SEMANTIC_CACHE_PATH', DEFAULT_DB_PATH)
+        self.db_path = os.path.expanduser(db_path) if db_path else None
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._indexes: Dict[str, Tuple[List[str], Any]] = {}
+        self._embeddings: "OrderedDict[str, Any]" = OrderedDict()
+
+        self._model = None
+        if use_embeddings and SENTENCE_TRANSFORMERS_AVAILABLE:
+            try:
+                self._model = SentenceTransformer(os.getenv('SEMANTIC_CACHE_MODEL', DEFAULT_EMBEDDING_MODEL))
+            except Exception as e:
+                logger.warning("語意快取嵌入模型載入失敗，僅使用精確比對: %s", e)
+
+        self._db = None
+        if self.db_path:
+            try:
+                self._open_db()
+            except Exception as e:
+                logger.warning("語意快取資料庫開啟失敗，僅使用記憶體快取: %s", e)
+                self._db = None
+
+    @property
+    def semantic_enabled(self) -> bool:
+        """是否已載入嵌入模型（未載入時只做精確比對）"""
+        return self._model is not None
+
+    def get(self, query: str, namespace: str = 'default', semantic: bool = True) -> Optional[Any]:
+        """查詢快取，未命中時回傳 None；semantic 為 False 時只做精確比對，不計算嵌入向量"""
+        normalized = normalize_query(query)
+        key = self._make_key(namespace, normalized)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(key)
+                    return entry.value
+                self._remove(key)
+
+        if not semantic:
+            return None
+        vector = self._embed(normalized)
+        if vector is None:
+            return None
+
+        signature = _query_signature(normalized)
+        with self._lock:
+            for candidate_key, score in self._search(namespace, vector):
+                if score < self.threshold:
+                    break
+                entry = self._entries.get(candidate_key)
+                if entry is None or entry.signature != signature:
+                    continue
+                if entry.expires_at <= now:
+                    self._remove(candidate_key)
+                    continue
+                self._entries.move_to_end(candidate_key)
+                return entry.value
+        return None
+
+    def set(self, query: str, value: Any, namespace: str = 'default'):
+        """寫入快取（值必須可序列化為 JSON）"""
+        normalized = normalize_query(query)
+        key = self._make_key(namespace, normalized)
+        vector = self._embed(normalized)
+        entry = _CacheEntry(
+            namespace=namespace,
+            query=normalized,
+            signature=_query_signature(normalized),
+            vector=vector,
+            value=value,
+            expires_at=time.time() + self.ttl
+        )
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._indexes.pop(namespace, None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO semantic_cache VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, namespace, normalized,
+                         vector.tobytes() if vector is not None else None,
+                         json.dumps(value, ensure_ascii=False), entry.expires_at)
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning("語意快取寫入失敗: %s", e)
+
+    def _make_key(self, namespace: str, normalized: str) -> str:
+        return hashlib.sha256(f"{namespace}\x00{normalized}".encode()).hexdigest()
+
+    def _embed(self, normalized: str):
+        """計算 L2 正規化後的嵌入向量（內積即為餘弦相似度）"""
+        if self._model is None:
+            return None
+
+        with self._lock:
+            vector = self._embeddings.get(normalized)
+            if vector is not None:
+                self._embeddings.move_to_end(normalized)
+                return vector
+
+        vector = self._model.encode([normalized], normalize_embeddings=True)[0].astype('float32')
+        with self._lock:
+            self._embeddings[normalized] = vector
+            if len(self._embeddings) > 128:
+                self._embeddings.popitem(last=False)
+        return vector
+
+    def _search(self, namespace: str, vector) -> List[Tuple[str, float]]:
+        """在同一命名空間內找出最相近的項目，依相似度遞減排序"""
+        if namespace not in self._indexes:
+            keys = [k for k, e in self._entries.items() if e.namespace == namespace and e.vector is not None]
+            if not keys:
+                return []
+            matrix = np.stack([self._entries[k].vector for k in keys])
+            if FAISS_AVAILABLE:
+                index = faiss.IndexFlatIP(matrix.shape[1])
+                index.add(matrix)
+            else:
+                index = matrix
+            self._indexes[namespace] = (keys, index)
+
+        keys, index = self._indexes[namespace]
+        top_k = min(5, len(keys))
+        if FAISS_AVAILABLE:
+            scores, ids = index.search(vector.reshape(1, -1), top_k)
+            return [(keys[i], float(s)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+
+        scores = index @ vector
+        ids = np.argsort(-scores)[:top_k]
+        return [(keys[i], float(scores[i])) for i in ids]
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._indexes.pop(entry.namespace, None)
+        if self._db is not None:
+            try:
+                self._db.execute("DELETE FROM semantic_cache WHERE key = ?", (key,))
+                self._db.commit()
+            except Exception as e:
+                logger.warning("語意快取刪除失敗: %s", e)
+
+    def _open_db(self):
+        """開啟 SQLite 持久化快取並載入未過期的項目"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                query TEXT NOT NULL,
+                embedding BLOB,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("DELETE FROM semantic_cache WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT key, namespace, query, embedding, value, expires_at FROM semantic_cache "
+            "ORDER BY expires_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+
+        dimension = self._model.get_sentence_embedding_dimension() if self._model is not None else None
+        for key, namespace, query, embedding, value, expires_at in reversed(rows):
+            vector = None
+            if embedding is not None and dimension is not None:
+                vector = np.frombuffer(embedding, dtype='float32')
+                if vector.shape[0] != dimension:  # 換過嵌入模型的舊資料只保留精確比對
+                    vector = None
+            self._entries[key] = _CacheEntry(
+                namespace=namespace,
+                query=query,
+                signature=_query_signature(query),
+                vector=vector,
+                value=json.loads(value),
+                expires_at=expires_at
+            )
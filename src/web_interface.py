@@ -1,6 +1,7 @@
 import os
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, render_template
 from dotenv import load_dotenv
+from src.agent import json_utils
 from src.agent.natural_language_agent import NaturalLanguageAgent
 from src.agent.jira_client import JiraClient
 
@@ -39,6 +40,10 @@ except Exception as e:
     print(f"NaturalLanguageAgent 初始化失敗: {e}")
     agent = None
 
+def json_response(payload, status: int = 200) -> Response:
+    """以 json_utils（orjson 可用時）序列化回應，取代標準庫 json 的 jsonify"""
+    return Response(json_utils.dumps_bytes(payload), status=status, mimetype='application/json')
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -46,31 +51,36 @@ def index():
 @app.route('/api/search', methods=['POST'])
 def search():
     if not jira_client or not agent:
-        return jsonify({'error': '服務未正確初始化，請檢查後端日誌或配置。'}), 500
+        return json_response({'error': '服務未正確初始化，請檢查後端日誌或配置。'}, 500)
 
-    data = request.get_json()
-    query = data.get('query')
+    try:
+        data = json_utils.loads(request.get_data() or b'{}')
+    except ValueError:
+        return json_response({'error': '請求內容不是有效的 JSON'}, 400)
+    query = data.get('query') if isinstance(data, dict) else None
 
     if not query:
-        return jsonify({'error': '請提供查詢內容'}), 400
+        return json_response({'error': '請提供查詢內容'}, 400)
 
     try:
         # 使用代理來處理自然語言查詢
         results, jql_queries = agent.process_query(query)
-        formatted_results = []
-        for issue in results:
-            formatted_results.append({
-                'key': issue.key,
-                'summary': issue.fields.summary,
-                'project': issue.fields.project.name,
-                'issuetype': issue.fields.issuetype.name,
-                'status': issue.fields.status.name,
-                'assignee': issue.fields.assignee.displayName if issue.fields.assignee else '未指派',
-                'updated': issue.fields.updated,
-                'url': f"{JIRA_SERVER}/browse/{issue.key}"
-            })
-
-        return jsonify({
+        # JiraClient 已將 issue 轉為只含所需欄位的字典，直接取值即可
+        formatted_results = [
+            {
+                'key': issue['key'],
+                'summary': issue['summary'],
+                'project': issue['project'],
+                'issuetype': issue['issuetype'],
+                'status': issue['status'],
+                'assignee': issue['assignee'] or '未指派',
+                'updated': issue['updated'],
+                'url': issue['url']
+            }
+            for issue in results
+        ]
+
+        return json_response({
             'query': query,
             'total_count': len(formatted_results),
             'results': formatted_results,
@@ -78,9 +88,11 @@ def search():
         })
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     # 嘗試從環境變量獲取端口，如果沒有則使用 8080
     port = int(os.environ.get('PORT', 8080))
-    app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
+    # 除錯模式（Werkzeug 除錯器與自動重載）只在明確設定 FLASK_DEBUG 時開啟
+    debug = os.environ.get('FLASK_DEBUG', '').lower() in ('1', 'true')
+    app.run(debug=debug, host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,92 @@
+import pytest
+import requests
+from jira.exceptions import JIRAError
+import src.agent.jira_client as jira_client
+from src.agent.jira_client import JiraClient
+
+
+def _make_client(monkeypatch, search_issues=None, use_aiohttp=False, is_cloud=True):
+    """以假的 jira 物件建立 JiraClient，search_issues 取代實際的 REST 查詢"""
+    class FakeJira:
+        def __init__(self, server, basic_auth):
+            self._session = requests.Session()
+            self._is_cloud = is_cloud
+
+        def search_issues(self, jql, **kwargs):
+            return search_issues(jql, **kwargs)
+
+    monkeypatch.setattr(jira_client, '_FastJSONJIRA', FakeJira)
+    monkeypatch.setattr(jira_client, 'AIOHTTP_AVAILABLE', use_aiohttp)
+    return JiraClient('https://example.atlassian.net', 'me@example.com', 'token')
+
+
+def _fake_aiohttp_session(posts, body):
+    """記錄 POST 請求並回傳固定內容的假 aiohttp.ClientSession"""
+    class FakeResponse:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        async def read(self):
+            return body
+
+    class FakeSession:
+        def __init__(self, connector=None, auth=None):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return False
+
+        def post(self, url, json):
+            posts.append((url, json))
+            return FakeResponse()
+
+    return FakeSession
+
+
+def test_transient_error_does_not_invalidate_jql(monkeypatch):
+    def search_issues(jql, **kwargs):
+        raise JIRAError("Service Unavailable", status_code=503)
+
+    client = _make_client(monkeypatch, search_issues)
+    assert client.search_issues('project = ABC') == []
+    assert 'project = ABC' not in client._validity_cache
+
+
+def test_jql_error_marks_jql_invalid(monkeypatch):
+    calls = []
+
+    def search_issues(jql, **kwargs):
+        calls.append(jql)
+        raise JIRAError("Error in the JQL Query", status_code=400)
+
+    client = _make_client(monkeypatch, search_issues)
+    assert client.search_issues('project = = ABC') == []
+    assert client.validate_jql('project = = ABC') is False
+    assert calls == ['project = = ABC']
+
+
+@pytest.mark.parametrize('is_cloud, path, expand', [
+    (True, '/rest/api/2/search/jql', 'comments'),
+    (False, '/rest/api/2/search', ['comments']),
+])
+def test_async_search_endpoint(monkeypatch, is_cloud, path, expand):
+    posts = []
+    body = b'{"issues": [{"key": "ABC-1", "fields": {"summary": "s", "created": "2025-01-01T10:00:00.000+0800"}}]}'
+    client = _make_client(monkeypatch, use_aiohttp=True, is_cloud=is_cloud)
+    monkeypatch.setattr(jira_client.aiohttp, 'ClientSession', _fake_aiohttp_session(posts, body))
+    monkeypatch.setattr(jira_client.aiohttp, 'TCPConnector', lambda **kwargs: None)
+
+    results = client.search_many(['project = ABC'])
+    assert [r['key'] for r in results[0]] == ['ABC-1']
+    assert posts[0][0] == 'https://example.atlassian.net' + path
+    assert posts[0][1]['expand'] == expand
+    assert client.validate_jql('project = ABC') is True
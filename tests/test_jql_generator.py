@@ -0,0 +1,34 @@
+from src.agent.jql_generator import JQLGenerator
+from src.agent.query_parser import QueryIntent
+
+
+def test_generated_jql_passes_syntactic_check():
+    generator = JQLGenerator()
+    intent = QueryIntent(intent_type="search_issues", entities={
+        "project": "ABC",
+        "time_range": {"start": "2025-01-01", "end": "2025-03-31"},
+        "user_conditions": ["assignee = 'me@example.com'", "reporter = 'me@example.com'"],
+        "main_keyword_conditions": ["text ~ '排行榜'", "text ~ 'leaderboard'"],
+    })
+
+    for jql in generator.generate_variations(intent):
+        assert generator.syntactic_validate(jql) is True
+    assert generator.syntactic_validate("project IS NOT EMPTY ORDER BY updated DESC") is True
+
+
+def test_syntactic_check_rejects_broken_jql():
+    generator = JQLGenerator()
+
+    assert generator.syntactic_validate("") is False
+    assert generator.syntactic_validate("text ~ 'don't' ORDER BY updated DESC") is False
+    assert generator.syntactic_validate("(project = 'ABC' ORDER BY updated DESC") is False
+    assert generator.syntactic_validate("project = 'ABC'") is False
+
+
+def test_syntactic_check_defers_unknown_fields():
+    generator = JQLGenerator()
+
+    assert generator.syntactic_validate("cf[10010] = 'x' ORDER BY updated DESC") is None
+    assert generator.syntactic_validate("storyPoints > 3 ORDER BY updated DESC") is None
+    # 引號內的文字不影響判斷
+    assert generator.syntactic_validate("summary ~ 'a (b' ORDER BY created ASC") is True
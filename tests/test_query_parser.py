@@ -1,5 +1,17 @@
+import asyncio
 import pytest
-from src.agent.query_parser import NaturalLanguageQueryParser
+from datetime import datetime
+from src.agent.query_parser import NaturalLanguageQueryParser, strip_code_fence
+
+def _fake_chain(content, calls=None, input_key=None):
+    """以固定內容回應的假 LLM chain；指定 input_key 時將該輸入記錄到 calls"""
+    class FakeChain:
+        def invoke(self, inputs):
+            if calls is not None:
+                calls.append(inputs[input_key])
+            return type("Message", (), {"content": content})()
+
+    return FakeChain()
 
 def test_quarter_parsing():
     parser = NaturalLanguageQueryParser()
@@ -30,4 +42,78 @@ def test_status_parsing():
     intent = parser.parse("我完成的工作")
 
     assert intent.status == ["Done"]
-    assert intent.assignee == "currentUser()"
\ No newline at end of file
+    assert intent.assignee == "currentUser()"
+
+def test_strip_code_fence():
+    assert strip_code_fence('```json\n{"project": "ABC"}\n```') == '{"project": "ABC"}'
+    assert strip_code_fence('```\n{"project": null}\n```\n') == '{"project": null}'
+    assert strip_code_fence(' {"project": "ABC"} ') == '{"project": "ABC"}'
+    assert strip_code_fence('```json {"relevant_tasks": []}```') == '{"relevant_tasks": []}'
+
+def test_expanded_keywords_cached():
+    parser = NaturalLanguageQueryParser()
+    calls = []
+    parser.llm = object()
+    parser._expand_chain = _fake_chain("登入, 任務, OAuth", calls, "text")
+
+    assert parser._get_llm_expanded_keywords("登入問題") == ["登入", "OAuth"]
+    assert parser._get_llm_expanded_keywords(" 登入問題 ") == ["登入", "OAuth"]
+    assert calls == ["登入問題"]
+
+def test_filter_results_sorts_by_relevance():
+    parser = NaturalLanguageQueryParser()
+    content = '```json\n{"relevant_issues": [{"key": "A-1", "relevance_score": 0.4, "reason": "r1"}, {"key": "A-2", "relevance_score": 0.9, "reason": "r2"}, {"key": "A-9", "relevance_score": 1.0, "reason": "missing"}]}\n```'
+    parser.llm = object()
+    parser.filter_chain = _fake_chain(content)
+    issues = [{"key": "A-1", "summary": "s1"}, {"key": "A-2", "summary": "s2"}, {"key": "A-3", "summary": "s3"}]
+
+    results = parser.filter_results("query", issues)
+    assert [r["key"] for r in results] == ["A-2", "A-1"]
+    assert results[0]["relevance_reason"] == "r2"
+    assert "relevance_score" not in issues[1]
+
+def test_is_trivial_query():
+    parser = NaturalLanguageQueryParser()
+    # 季度解析只接受今年與去年，年份跟著執行時間變動
+    assert parser.is_trivial_query(f"我 {datetime.now().year} Q1 的工作記錄")
+    assert parser.is_trivial_query("本月最新的任務")
+    assert not parser.is_trivial_query("iOS 相關的工作")
+    assert not parser.is_trivial_query("排行榜以外的工作")
+
+def test_parse_cache_can_be_disabled():
+    calls = []
+    for enable_cache, expected_calls in ((True, 1), (False, 2)):
+        calls.clear()
+        parser = NaturalLanguageQueryParser(enable_cache=enable_cache)
+        parser.llm = object()
+        parser.chain = _fake_chain('{"keywords": {"main": ["iOS"], "related": []}}', calls, "query")
+        parser.parse("iOS 登入問題")
+        parser.parse("iOS 登入問題")
+        assert len(calls) == expected_calls
+
+def test_llm_failure_without_fallback_returns_none():
+    class FailingChain:
+        def invoke(self, inputs):
+            raise RuntimeError("LLM unavailable")
+
+        async def ainvoke(self, inputs):
+            raise RuntimeError("LLM unavailable")
+
+    parser = NaturalLanguageQueryParser()
+    parser.llm = object()
+    parser.chain = FailingChain()
+    parser.filter_chain = FailingChain()
+    issues = [{"key": "A-1", "summary": "s1"}]
+
+    assert parser.parse("iOS 登入問題", fallback=False) is None
+    assert parser.parse("iOS 登入問題") is not None
+    assert asyncio.run(parser.aparse("iOS 登入問題", fallback=False)) is None
+    assert parser.filter_results("iOS 登入問題", issues, fallback=False) is None
+    assert parser.filter_results("iOS 登入問題", issues) == issues
+
+def test_llm_time_without_dates_is_none():
+    parser = NaturalLanguageQueryParser()
+    parser.llm = object()
+    parser.chain = _fake_chain('{"keywords": {"main": ["iOS"]}, "time": {"start": null, "end": null}}')
+
+    assert parser.parse("iOS 登入問題").entities["time_range"] is None
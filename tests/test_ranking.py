@@ -0,0 +1,29 @@
+from src.agent.ranking import bm25_top_k, tokenize
+
+
+def _issue(key, summary, description=None):
+    return {"key": key, "summary": summary, "description": description}
+
+
+def test_tokenize_mixes_words_and_cjk_bigrams():
+    assert tokenize("修正 iOS 登入問題") == ["ios", "修正", "登入", "入問", "問題"]
+
+
+def test_top_k_keeps_relevant_issues_in_original_order():
+    issues = [_issue(f"ABC-{i}", f"雜項工作 {i}") for i in range(10)]
+    issues[7] = _issue("ABC-7", "排行榜 API 效能調整")
+    issues[2] = _issue("ABC-2", "排行榜頁面", "排行榜顯示錯誤")
+
+    top = bm25_top_k("排行榜相關的工作", issues, k=3)
+
+    keys = [issue["key"] for issue in top]
+    assert len(keys) == 3
+    assert {"ABC-2", "ABC-7"} <= set(keys)
+    assert keys == sorted(keys)
+
+
+def test_top_k_without_overlap_keeps_leading_issues():
+    issues = [_issue(f"ABC-{i}", f"task {i}") for i in range(5)]
+
+    assert bm25_top_k("本月的工作", issues, k=2) == issues[:2]
+    assert bm25_top_k("本月的工作", issues, k=10) == issues
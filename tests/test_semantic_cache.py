@@ -0,0 +1,48 @@
+import time
+from src.agent.semantic_cache import SemanticCache, _query_signature, normalize_query, results_namespace
+
+
+def test_exact_match_hit():
+    cache = SemanticCache(db_path='', use_embeddings=False)
+    cache.set("我 2025 的 iOS 任務", {"intent_type": "search_issues"}, namespace='parse')
+
+    assert cache.get("  我 2025 的 ios 任務 ", namespace='parse') == {"intent_type": "search_issues"}
+    assert cache.get("我 2025 的 iOS 任務", namespace='filter') is None
+
+
+def test_expired_entry_is_dropped():
+    cache = SemanticCache(ttl=0, db_path='', use_embeddings=False)
+    cache.set("本月的工作", [1, 2, 3])
+    time.sleep(0.01)
+
+    assert cache.get("本月的工作") is None
+
+
+def test_persisted_across_instances(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    SemanticCache(db_path=db_path, use_embeddings=False).set("排行榜以外的工作", [{"key": "ABC-1"}])
+
+    cache = SemanticCache(db_path=db_path, use_embeddings=False)
+    assert cache.get("排行榜以外的工作") == [{"key": "ABC-1"}]
+
+
+def test_results_namespace_ignores_order():
+    first = results_namespace('filter', [{"key": "ABC-2"}, {"key": "ABC-1"}])
+    second = results_namespace('filter', [{"key": "ABC-1"}, {"key": "ABC-2"}])
+
+    assert first == second
+    assert normalize_query("A  B\tC") == "a b c"
+
+
+def test_normalize_query_ignores_punctuation():
+    assert normalize_query("我本月的任務？") == normalize_query("我本月的任務")
+    assert normalize_query("Hello, world!") == "hello world"
+    assert normalize_query("版本 v1.2 的問題。") == "版本 v1.2 的問題"
+
+
+def test_signature_keeps_time_and_sort_words():
+    for first, second in (("我本月的任務", "我上個月的任務"),
+                          ("我今年的工作", "我去年的工作"),
+                          ("最新的 iOS 任務", "最久的 iOS 任務")):
+        assert _query_signature(normalize_query(first)) != _query_signature(normalize_query(second))
+    assert _query_signature(normalize_query("我本月的任務")) == _query_signature(normalize_query("本月我的任務"))
@@ -2,18 +2,143 @@
 # -*- coding: utf-8 -*-
 
 import os
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, send_from_directory
 from dotenv import load_dotenv
-from src.agent.query_parser import NaturalLanguageQueryParser
+from langchain_core.messages import HumanMessage, SystemMessage
+from src.agent import json_utils
+from src.agent.query_parser import NaturalLanguageQueryParser, strip_code_fence
 from src.agent.jql_generator import JQLGenerator
 from src.agent.jira_client import JiraClient
+from src.agent.semantic_cache import DEFAULT_DB_PATH, SemanticCache, results_namespace
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+from itertools import chain
+import heapq
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 app = Flask(__name__)
 
+# smart_sort 的排序意圖用語，模組載入時編譯一次，每次查詢只需各掃描一次
+_LONGEST_SORT_RE = re.compile(r'最久|處理最久|持續最久|最長時間|最長')
+_RECENT_SORT_RE = re.compile(r'最新|最近|新建')
+_MY_COMMENT_SORT_RE = re.compile(r'我的留言|我留言|我的評論|我評言')
+_COMMENT_SORT_RE = re.compile(r'留言數|評論數|討論|留言|評論')
+
+# 結果少於此數量時不做 LLM 篩選（排除性查詢除外），直接回傳排序結果
+MIN_RESULTS_FOR_LLM_FILTER = 6
+
+# 排序後只保留前 FILTER_CANDIDATES 筆送進 LLM 篩選，回傳給前端的 MAX_RESPONSE_RESULTS 筆也從中挑選
+FILTER_CANDIDATES = 50
+MAX_RESPONSE_RESULTS = 20
+
+# LLM 篩選時每批送出的任務數與同時進行的批次數；每批的輸入較短，並行送出可縮短整體等待時間
+FILTER_CHUNK_SIZE = 10
+FILTER_MAX_WORKERS = 5
+# Web 介面 LLM 篩選結果的持久化快取，與命令列的語意快取分開存放
+WEB_FILTER_CACHE_PATH = os.path.join(os.path.dirname(DEFAULT_DB_PATH), 'filter_cache.db')
+
+# 送進 LLM 的任務欄位縮寫，縮短每筆任務佔用的輸入 token（說明見 STATIC_FILTER_PREAMBLE）
+FILTER_FIELD_ALIASES = {
+    "key": "key",
+    "summary": "s",
+    "description": "d",
+    "comments_text": "c",
+    "my_comments_text": "mc",
+    "assignee": "a",
+    "status": "st",
+    "duration_days": "dd",
+    "timespent_hours": "th",
+    "originalestimate_hours": "eh",
+    "created": "cr",
+    "resolutiondate": "rd",
+    "comment_count": "cc",
+    "my_comment_count": "mcc",
+}
+
+# LLM 篩選的固定說明（規則、欄位說明、輸出格式）放在 system 訊息作為不變的前綴，
+# 可命中 Azure OpenAI 的提示快取；每次變動的查詢與任務列表放在最後的 human 訊息
+STATIC_FILTER_PREAMBLE = """請仔細分析查詢意圖，從最後提供的任務列表中篩選出與原始查詢最相關的任務。
+
+重要篩選規則：
+1. **排除性查詢處理（最高優先級）**：
+   - 如果查詢包含「無關」、「以外」、「除了」、「不包括」、「不是」、「非」等排除性語言：
+     * 必須嚴格排除包含指定關鍵字的所有任務
+     * 例如：「跟 cron-chart 無關的」→ 排除所有標題、描述、評論中包含 "cron", "chart", "cron-chart" 的任務
+     * 例如：「排行榜以外的工作」→ 排除所有包含 "排行榜", "榜單", "CHART", "chart" 的任務
+     * 相關性分數設為 0，完全排除
+2. 如果查詢包含特定關鍵字（如 "Android", "iOS", "Web", "WEB View" 等）：
+   - 優先在任務的標題(summary)、描述(description)和評論內容(comments_text)中搜尋完整的關鍵字組合
+   - 對於複合關鍵字（如 "WEB View"），如果找不到完整匹配，可以考慮包含部分關鍵字（如 "WEB"）但在評論或描述中提到完整概念的任務
+   - 例如：標題是 "[WEB]" 但描述或評論中提到 "WEB View" 的任務應該被包含
+3. 如果查詢涉及時間相關條件：
+   - 「花費超過一週」：篩選 duration_days > 7 或 timespent_hours > 40 的任務
+   - 「快速完成」：篩選 duration_days <= 3 或 timespent_hours <= 8 的任務
+   - 「長期項目」：篩選 duration_days > 30 的任務
+   - 「時間追蹤」相關：查看 timespent_hours 和 originalestimate_hours 字段
+4. 如果查詢涉及任務狀態條件：
+   - 「還沒結束」、「進行中」、「未完成」：篩選 status 不是 "Done"、"Closed"、"Resolved" 的任務
+   - 「已完成」、「已結束」：篩選 status 是 "Done"、"Closed"、"Resolved" 的任務
+   - 「沒有進度」：篩選 status 是 "To Do"、"Open"、"New" 的任務
+   - 「進行中」：篩選 status 是 "In Progress"、"In Review" 的任務
+   - 重要：如果沒有 resolutiondate，表示任務未完成；如果有值，表示任務已完成
+5. 如果查詢涉及評論相關條件：
+   **我的留言/評論相關：**
+   - 「我留言最多」、「我的評論最多」：按 my_comment_count 降序排列
+   - 「我有留言的」：篩選 my_comment_count > 0 的任務
+   - 「我沒有留言的」：篩選 my_comment_count = 0 的任務
+   - 「我留言超過X次」：篩選 my_comment_count > X 的任務
+   **全部留言/評論相關：**
+   - 「最多評論」、「討論熱烈」：按 comment_count 降序排列，選擇評論數最多的任務
+   - 「無人討論」：篩選 comment_count = 0 的任務
+   - 「評論超過X個」：篩選 comment_count > X 的任務
+6. 例如「Android 相關工作」只保留包含 "Android" 的任務
+7. 例如「排行榜以外的工作」要排除所有與排行榜、榜單、CHART 相關的任務
+8. 相關性分數範圍 0-1，只返回分數 > 0.3 的高相關任務
+
+任務字段說明（任務列表為緊湊 JSON，欄位使用括號中的縮寫，沒有值的欄位會省略）：
+- key (key): 任務代號
+- summary (s): 標題
+- description (d): 描述
+- assignee (a): 負責人
+- status (st): 任務狀態（如 "To Do", "In Progress", "Done", "Closed" 等）
+- created (cr): 建立日期
+- duration_days (dd): 任務從創建到完成的天數
+- timespent_hours (th): 實際花費的工時（小時）
+- originalestimate_hours (eh): 原始估計工時（小時）
+- comment_count (cc): 任務總評論數量（所有人的留言）
+- my_comment_count (mcc): 我的評論數量（只統計當前用戶的留言）
+- comments_text (c): 所有評論內容
+- my_comments_text (mc): 我的評論內容
+- resolutiondate (rd): 完成日期（省略表示未完成）
+
+請返回 JSON 格式，包含相關任務的 key 和相關性分數：
+{
+    "relevant_tasks": [
+        {"key": "TASK-123", "relevance_score": 0.9, "reason": "狀態為 In Progress，符合未完成條件"},
+        {"key": "TASK-456", "relevance_score": 0.8, "reason": "狀態為 To Do，沒有進度且未完成"}
+    ]
+}
+
+注意：請嚴格按照查詢條件匹配，不相關的任務不要包含。"""
+
+# 每次篩選唯一變動的部分，接在固定前綴之後
+FILTER_REQUEST_TEMPLATE = "原始查詢: {query}\n\n任務列表：\n{task_json}"
+
+
+def compact_task_json(task_summaries: list) -> str:
+    """以縮寫欄位序列化任務列表（無縮排、省略空值），供 LLM 篩選使用"""
+    return json_utils.dumps([
+        {FILTER_FIELD_ALIASES[field]: value for field, value in task.items() if value is not None and value != ""}
+        for task in task_summaries
+    ])
+
+
 class JiraAgenticAI:
     """Jira Agentic AI 主類"""
 
@@ -26,8 +151,13 @@ class JiraAgenticAI:
         try:
             self.jira_client = JiraClient()
         except Exception as e:
-            print(f"⚠️  Jira 客戶端初始化失敗: {e}")
+            logger.warning("Jira 客戶端初始化失敗: %s", e)
             self.jira_client = None
+        # LLM 篩選結果快取：同一查詢且候選任務相同時直接重用相關性分數（只做精確比對）；
+        # 使用獨立的 SQLite 檔案，不與命令列的快取互相載入或刪除彼此的資料
+        self._filter_cache = SemanticCache(ttl=86400, db_path=WEB_FILTER_CACHE_PATH, use_embeddings=False)
+        # 分批 LLM 篩選與 JQL 遠端驗證共用的執行緒池（都是等待網路回應的工作）
+        self._executor = ThreadPoolExecutor(max_workers=FILTER_MAX_WORKERS)
 
     def process_query(self, query) -> dict:
         """處理自然語言查詢"""
@@ -41,8 +171,8 @@ class JiraAgenticAI:
             year = None
             user_conditions = {}
         
-        print(f"處理查詢: '{query_text}'")
-        print(f"用戶條件: {user_conditions}")
+        logger.info("處理查詢: '%s'", query_text)
+        logger.debug("用戶條件: %s", user_conditions)
         
         # 1. 解析查詢意圖
         if isinstance(query, dict):
@@ -50,8 +180,8 @@ class JiraAgenticAI:
         else:
             intent = self.parser.parse(query_text)
         
-        print(f"解析結果 - 關鍵字: {intent.entities.get('keywords', [])}")
-        print(f"解析結果 - 用戶條件: {intent.entities.get('user_conditions', [])}")
+        logger.debug("解析結果 - 關鍵字: %s", intent.entities.get('keywords', []))
+        logger.debug("解析結果 - 用戶條件: %s", intent.entities.get('user_conditions', []))
 
         # 2. 生成 JQL 查詢
         jql_queries = self.jql_generator.generate_variations(intent)
@@ -59,25 +189,32 @@ class JiraAgenticAI:
         # 3. 執行查詢
         all_results = []
         if self.jira_client:
-            for jql in jql_queries:
-                if self.jira_client.validate_jql(jql):
-                    results = self.jira_client.search_issues(jql)
-                    all_results.extend(results)
-
-        # 去重
-        unique_results = []
-        seen_keys = set()
-        for result in all_results:
-            if result['key'] not in seen_keys:
-                unique_results.append(result)
-                seen_keys.add(result['key'])
-
-        # 智能排序：根據查詢內容選擇排序方式
+            # 先做本地語法檢查，只有無法判斷的 JQL 才向 Jira 驗證（並行送出）
+            validity = [self.jql_generator.syntactic_validate(jql) for jql in jql_queries]
+            ambiguous = [jql for jql, valid in zip(jql_queries, validity) if valid is None]
+            remote_validity = dict(zip(ambiguous, self._executor.map(self.jira_client.validate_jql, ambiguous)))
+            valid_jqls = [
+                jql for jql, valid in zip(jql_queries, validity)
+                if valid or (valid is None and remote_validity[jql])
+            ]
+            # 各 JQL 變體同時查詢，總延遲取決於最慢的一次查詢而非加總；直接串接各查詢的結果，不另外複製成一個大列表
+            all_results = chain.from_iterable(self.jira_client.search_many(valid_jqls))
+
+        # 以 key 去重：保留第一次出現的位置；重複的是同一筆 issue 以相同欄位查回的內容，保留哪一份皆可
+        unique_results = list({result['key']: result for result in all_results}.values())
+
+        # 智能排序：根據查詢內容選擇排序方式；只需要前 FILTER_CANDIDATES 筆，以 heapq 取代完整排序
         def smart_sort(results, query_text):
             query_lower = query_text.lower()
+
+            def top_candidates(sort_key):
+                """以 (排序鍵, -位置) 裝飾每筆結果後取前 FILTER_CANDIDATES 筆：排序鍵只計算一次，
+                同鍵時位置較前者優先（與穩定排序相同），也不會比較到 dict 本身"""
+                decorated = ((sort_key(r), -i) for i, r in enumerate(results))
+                return [results[-i] for _, i in heapq.nlargest(FILTER_CANDIDATES, decorated)]
             
             # 檢查是否是時間相關查詢
-            if any(keyword in query_lower for keyword in ['最久', '處理最久', '持續最久', '最長時間', '最長']):
+            if _LONGEST_SORT_RE.search(query_lower):
                 # 按處理天數降序排序（未完成任務）
                 def sort_key(x):
                     processing_days = x.get('processing_days')
@@ -90,50 +227,64 @@ class JiraAgenticAI:
                     else:
                         return (-1, 0)  # 沒有時間資料的任務排在最後
                 
-                sorted_results = sorted(results, key=sort_key, reverse=True)
-                print(f"按處理時間排序：找到 {len([r for r in results if r.get('processing_days') is not None])} 個未完成任務")
+                sorted_results = top_candidates(sort_key)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("按處理時間排序：找到 %d 個未完成任務",
+                                 sum(1 for r in results if r.get('processing_days') is not None))
                 
-            elif any(keyword in query_lower for keyword in ['最新', '最近', '新建']):
+            elif _RECENT_SORT_RE.search(query_lower):
                 # 按創建時間降序排序
-                sorted_results = sorted(results, key=lambda x: x.get('created', ''), reverse=True)
-                print(f"按創建時間排序（最新先）")
+                sorted_results = top_candidates(lambda x: x.get('created', ''))
+                logger.debug("按創建時間排序（最新先）")
                 
-            elif any(keyword in query_lower for keyword in ['我的留言', '我留言', '我的評論', '我評言']):
+            elif _MY_COMMENT_SORT_RE.search(query_lower):
                 # 按我的評論數降序排序
-                sorted_results = sorted(results, key=lambda x: x.get('my_comment_count', 0), reverse=True)
-                print(f"按我的評論數排序（最多先）：找到 {len([r for r in results if r.get('my_comment_count', 0) > 0])} 個我有留言的任務")
+                sorted_results = top_candidates(lambda x: x.get('my_comment_count', 0))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("按我的評論數排序（最多先）：找到 %d 個我有留言的任務",
+                                 sum(1 for r in results if r.get('my_comment_count', 0) > 0))
                 
-            elif any(keyword in query_lower for keyword in ['留言數', '評論數', '討論', '留言', '評論']):
+            elif _COMMENT_SORT_RE.search(query_lower):
                 # 按總評論數降序排序
-                sorted_results = sorted(results, key=lambda x: x.get('comment_count', 0), reverse=True)
-                print(f"按總評論數排序（最多先）：找到 {len([r for r in results if r.get('comment_count', 0) > 0])} 個有評論的任務")
+                sorted_results = top_candidates(lambda x: x.get('comment_count', 0))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("按總評論數排序（最多先）：找到 %d 個有評論的任務",
+                                 sum(1 for r in results if r.get('comment_count', 0) > 0))
                 
             else:
                 # 預設按更新時間降序排序
-                sorted_results = sorted(results, key=lambda x: x.get('updated', ''), reverse=True)
-                print(f"按更新時間排序（預設）")
+                sorted_results = top_candidates(lambda x: x.get('updated', ''))
+                logger.debug("按更新時間排序（預設）")
             
             return sorted_results
         
         sorted_results = smart_sort(unique_results, query_text)
 
-        # 5. 使用 LLM 篩選相關結果
+        # 5. 使用 LLM 篩選相關結果（未篩選時總數仍以所有查到的任務計算）
         filtered_results = sorted_results
-        print(f"檢查 LLM 篩選條件:")
-        print(f"  sorted_results 數量: {len(sorted_results) if sorted_results else 0}")
-        print(f"  hasattr(self.parser, 'llm'): {hasattr(self.parser, 'llm')}")
-        print(f"  self.parser.llm 存在: {self.parser.llm if hasattr(self.parser, 'llm') else 'N/A'}")
+        total_count = len(unique_results)
+        logger.debug("檢查 LLM 篩選條件: 候選數量 %d，LLM 可用: %s",
+                     len(sorted_results), bool(getattr(self.parser, 'llm', None)))
+
+        # 只有時間與固定用語的查詢（如「我 2025 Q1 的任務」）已由 JQL 與 smart_sort 完整表達，
+        # 結果很少時篩選也沒有意義，兩者都不必等一次 LLM 往返
+        skip_llm_filter = (
+            self.parser.is_trivial_query(query_text)
+            or (len(sorted_results) < MIN_RESULTS_FOR_LLM_FILTER and not intent.is_exclusion)
+        )
+        if skip_llm_filter:
+            logger.debug("略過 LLM 篩選：查詢沒有需要語意判斷的條件或結果數量很少")
 
-        if sorted_results and hasattr(self.parser, 'llm') and self.parser.llm:
+        if sorted_results and hasattr(self.parser, 'llm') and self.parser.llm and not skip_llm_filter:
             try:
                 # 準備任務摘要供 LLM 分析
                 task_summaries = []
-                for result in sorted_results[:50]:  # 限制分析數量以避免 token 過多
+                for result in sorted_results:  # smart_sort 已限制分析數量以避免 token 過多
                     task_summaries.append({
                         "key": result["key"],
                         "summary": result["summary"],
                         "description": (result.get("description") or "")[:200],  # 限制描述長度，處理 None 值
-                        "comments_text": (result.get("comments_text") or "")[:300],  # 所有評論內容，限制長度
+                        "comments_text": (result.get("comments_text") or "")[:200],  # 所有評論內容，限制長度
                         "my_comments_text": (result.get("my_comments_text") or "")[:200],  # 我的評論內容
                         "assignee": result.get("assignee", ""),
                         "status": result.get("status", ""),
@@ -146,156 +297,145 @@ class JiraAgenticAI:
                         "my_comment_count": result.get("my_comment_count", 0)  # 我的評論數量
                     })
 
-                # 任務狀態統計
-                status_counts = {}
-                completed_count = 0
-                for task in task_summaries:
-                    status = task.get("status", "")
-                    if status in status_counts:
-                        status_counts[status] += 1
-                    else:
-                        status_counts[status] = 1
-                    if task.get("resolutiondate"):
-                        completed_count += 1
-
-                print(f"任務狀態分布: {status_counts}")
-                print(f"已完成任務數量: {completed_count}, 未完成任務數量: {len(task_summaries) - completed_count}")
-
-                # 使用 LLM 篩選相關任務
-                filter_prompt = f"""
-                原始查詢: {query}
-
-                請仔細分析查詢意圖，從以下任務中篩選出與查詢最相關的任務。
-
-                重要篩選規則：
-                1. **排除性查詢處理（最高優先級）**：
-                   - 如果查詢包含「無關」、「以外」、「除了」、「不包括」、「不是」、「非」等排除性語言：
-                     * 必須嚴格排除包含指定關鍵字的所有任務
-                     * 例如：「跟 cron-chart 無關的」→ 排除所有標題、描述、評論中包含 "cron", "chart", "cron-chart" 的任務
-                     * 例如：「排行榜以外的工作」→ 排除所有包含 "排行榜", "榜單", "CHART", "chart" 的任務
-                     * 相關性分數設為 0，完全排除
-                2. 如果查詢包含特定關鍵字（如 "Android", "iOS", "Web", "WEB View" 等）：
-                   - 優先在任務的標題(summary)、描述(description)和評論內容(comments_text)中搜尋完整的關鍵字組合
-                   - 對於複合關鍵字（如 "WEB View"），如果找不到完整匹配，可以考慮包含部分關鍵字（如 "WEB"）但在評論或描述中提到完整概念的任務
-                   - 例如：標題是 "[WEB]" 但描述或評論中提到 "WEB View" 的任務應該被包含
-                3. 如果查詢涉及時間相關條件：
-                   - 「花費超過一週」：篩選 duration_days > 7 或 timespent_hours > 40 的任務
-                   - 「快速完成」：篩選 duration_days <= 3 或 timespent_hours <= 8 的任務
-                   - 「長期項目」：篩選 duration_days > 30 的任務
-                   - 「時間追蹤」相關：查看 timespent_hours 和 originalestimate_hours 字段
-                4. 如果查詢涉及任務狀態條件：
-                   - 「還沒結束」、「進行中」、「未完成」：篩選 status 不是 "Done"、"Closed"、"Resolved" 的任務
-                   - 「已完成」、「已結束」：篩選 status 是 "Done"、"Closed"、"Resolved" 的任務
-                   - 「沒有進度」：篩選 status 是 "To Do"、"Open"、"New" 的任務
-                   - 「進行中」：篩選 status 是 "In Progress"、"In Review" 的任務
-                   - 重要：如果 resolutiondate 為 null，表示任務未完成；如果有值，表示任務已完成
-                5. 如果查詢涉及評論相關條件：
-                   **我的留言/評論相關：**
-                   - 「我留言最多」、「我的評論最多」：按 my_comment_count 降序排列
-                   - 「我有留言的」：篩選 my_comment_count > 0 的任務
-                   - 「我沒有留言的」：篩選 my_comment_count = 0 的任務
-                   - 「我留言超過X次」：篩選 my_comment_count > X 的任務
-                   **全部留言/評論相關：**
-                   - 「最多評論」、「討論熱烈」：按 comment_count 降序排列，選擇評論數最多的任務
-                   - 「無人討論」：篩選 comment_count = 0 的任務
-                   - 「評論超過X個」：篩選 comment_count > X 的任務
-                6. 例如「Android 相關工作」只保留包含 "Android" 的任務
-                7. 例如「排行榜以外的工作」要排除所有與排行榜、榜單、CHART 相關的任務
-                8. 相關性分數範圍 0-1，只返回分數 > 0.3 的高相關任務
-
-                任務字段說明：
-                - duration_days: 任務從創建到完成的天數
-                - timespent_hours: 實際花費的工時（小時）
-                - originalestimate_hours: 原始估計工時（小時）
-                - comment_count: 任務總評論數量（所有人的留言）
-                - my_comment_count: 我的評論數量（只統計當前用戶的留言）
-                - comments_text: 所有評論內容
-                - my_comments_text: 我的評論內容
-                - status: 任務狀態（如 "To Do", "In Progress", "Done", "Closed" 等）
-                - resolutiondate: 完成日期（null 表示未完成）
-
-                任務列表：
-                {json.dumps(task_summaries, ensure_ascii=False, indent=2)}
-
-                請返回 JSON 格式，包含相關任務的 key 和相關性分數：
-                {{
-                    "relevant_tasks": [
-                        {{"key": "TASK-123", "relevance_score": 0.9, "reason": "狀態為 In Progress，符合未完成條件"}},
-                        {{"key": "TASK-456", "relevance_score": 0.8, "reason": "狀態為 To Do，沒有進度且未完成"}}
-                    ]
-                }}
-
-                注意：請嚴格按照查詢條件匹配，不相關的任務不要包含。
-                """
-
-                from langchain.schema import HumanMessage
-                print(f"開始 LLM 篩選，任務數量: {len(task_summaries)}")
-
-                try:
-                    filter_result = self.parser.llm.invoke([HumanMessage(content=filter_prompt)])
-                    print(f"LLM 調用成功，結果類型: {type(filter_result)}")
-
-                    if hasattr(filter_result, 'content'):
-                        print(f"LLM 內容存在，類型: {type(filter_result.content)}")
-                    else:
-                        print("LLM 結果沒有 content 屬性")
-
-                except Exception as llm_error:
-                    print(f"LLM 調用失敗: {llm_error}")
-                    filter_result = None
-
-                # 解析篩選結果
-                if not filter_result or not hasattr(filter_result, 'content') or not filter_result.content:
-                    print("LLM 篩選失敗: 沒有返回有效內容")
-                    filtered_results = sorted_results
-                else:
-                    filter_content = filter_result.content.strip()
-                    print(f"LLM 原始回應: {filter_content[:200]}...")  # 調試輸出
-
-                    if filter_content.startswith('```'):
-                        filter_content = '\n'.join(filter_content.split('\n')[1:-1])
-
-                    try:
-                        parsed_filter = json.loads(filter_content)
-                        relevant_tasks = parsed_filter.get("relevant_tasks", [])
-
-                        # 根據相關性重新排序結果
-                        if relevant_tasks:
-                            task_relevance = {task["key"]: task.get("relevance_score", 0) for task in relevant_tasks if task.get("relevance_score") is not None}
-                            filtered_results = [
-                                result for result in sorted_results
-                                if result["key"] in task_relevance and task_relevance.get(result["key"], 0) > 0.3
-                            ]
-                            filtered_results.sort(key=lambda x: task_relevance.get(x["key"], 0), reverse=True)
-
-                            print(f"LLM 篩選結果: 從 {len(sorted_results)} 個任務中篩選出 {len(filtered_results)} 個相關任務")
-                            for task in relevant_tasks:
-                                score = task.get("relevance_score", 0)
-                                if score and score > 0.3:
-                                    print(f"  - {task.get('key', 'N/A')}: {score:.2f} - {task.get('reason', 'N/A')}")
+                # 任務狀態統計只用於除錯輸出，未開啟 DEBUG 時不必走訪
+                if logger.isEnabledFor(logging.DEBUG):
+                    status_counts = {}
+                    completed_count = 0
+                    for task in task_summaries:
+                        status = task.get("status", "")
+                        if status in status_counts:
+                            status_counts[status] += 1
                         else:
-                            print("LLM 篩選結果: 沒有找到相關任務")
-                            filtered_results = sorted_results
-                    except json.JSONDecodeError as e:
-                        print(f"LLM 回應解析失敗: {e}")
-                        print(f"原始內容: {filter_content}")
-                        filtered_results = sorted_results
+                            status_counts[status] = 1
+                        if task.get("resolutiondate"):
+                            completed_count += 1
+
+                    logger.debug("任務狀態分布: %s", status_counts)
+                    logger.debug("已完成任務數量: %d, 未完成任務數量: %d",
+                                 completed_count, len(task_summaries) - completed_count)
+
+                # 候選任務相同時重用先前的篩選結果，不必再等一次 LLM 往返
+                filter_namespace = results_namespace('web-filter', sorted_results)
+                task_relevance = self._filter_cache.get(query_text, namespace=filter_namespace, semantic=False)
+                if task_relevance is not None:
+                    logger.debug("LLM 篩選快取命中，任務數量: %d", len(task_summaries))
+                else:
+                    # 評論數排序規則（「留言最多」、「評論最多」）要比較所有候選任務，分批時各批只會各自挑出最多的幾筆，
+                    # 因此這類查詢一次送出全部候選
+                    query_lower = query_text.lower()
+                    compare_all = bool(_MY_COMMENT_SORT_RE.search(query_lower) or _COMMENT_SORT_RE.search(query_lower))
+                    task_relevance = self._llm_filter(query, task_summaries, single_batch=compare_all)
+                    if task_relevance is not None:
+                        self._filter_cache.set(query_text, task_relevance, namespace=filter_namespace)
+
+                # 根據相關性重新排序結果
+                if task_relevance:
+                    # 只走訪 LLM 回傳的相關任務，以 key 找回結果的位置；依分數排序，同分維持 smart_sort 的順序
+                    position_by_key = {result["key"]: i for i, result in enumerate(sorted_results)}
+                    ranked = sorted(
+                        (-score, position_by_key[key]) for key, score in task_relevance.items()
+                        if score > 0.3 and key in position_by_key
+                    )
+                    filtered_results = [sorted_results[i] for _, i in ranked]
+                    total_count = len(filtered_results)
+                    logger.info("LLM 篩選結果: 從 %d 個任務中篩選出 %d 個相關任務", len(sorted_results), len(filtered_results))
+                else:
+                    filtered_results = sorted_results
             except Exception as e:
-                print(f"LLM 篩選失敗，使用原始結果: {e}")
-                import traceback
-                print(f"詳細錯誤信息: {traceback.format_exc()}")
+                logger.warning("LLM 篩選失敗，使用原始結果: %s", e, exc_info=True)
                 filtered_results = sorted_results
 
         return {
             'query': query_text,
             'intent': intent.model_dump(),
             'jql_queries': jql_queries,
-            'results': filtered_results[:20],  # 限制結果數量
-            'total_count': len(filtered_results)
+            'results': filtered_results[:MAX_RESPONSE_RESULTS],  # 限制結果數量
+            'total_count': total_count
         }
 
-# 初始化 AI 系統
-ai = JiraAgenticAI()
+    def _llm_filter(self, query, task_summaries: list, single_batch: bool = False):
+        """分批並行呼叫 LLM 篩選任務，回傳 {key: 相關性分數}；任一批失敗時回傳 None
+
+        single_batch 為 True 時以單一請求送出全部任務，供需要在所有候選之間比較的查詢使用
+        """
+        logger.debug("開始 LLM 篩選，任務數量: %d", len(task_summaries))
+        chunk_size = max(len(task_summaries), 1) if single_batch else FILTER_CHUNK_SIZE
+        chunks = [task_summaries[i:i + chunk_size] for i in range(0, len(task_summaries), chunk_size)]
+        chunk_results = list(self._executor.map(lambda chunk: self._llm_filter_chunk(query, chunk), chunks))
+
+        # 部分批次失敗時無法判斷其餘任務是否相關，整體視為失敗（改用原始結果，也不寫入快取）
+        if any(result is None for result in chunk_results):
+            return None
+
+        task_relevance = {}
+        for result in chunk_results:
+            task_relevance.update(result)
+        if not task_relevance:
+            logger.info("LLM 篩選結果: 沒有找到相關任務")
+        return task_relevance
+
+    def _llm_filter_chunk(self, query, task_summaries: list):
+        """以單一 LLM 呼叫篩選一批任務，回傳 {key: 相關性分數}；呼叫或解析失敗時回傳 None"""
+        filter_messages = [
+            SystemMessage(content=STATIC_FILTER_PREAMBLE),
+            HumanMessage(content=FILTER_REQUEST_TEMPLATE.format(query=query, task_json=compact_task_json(task_summaries)))
+        ]
+
+        try:
+            filter_result = self.parser.llm.invoke(filter_messages)
+            logger.debug("LLM 調用成功，結果類型: %s", type(filter_result))
+
+            if hasattr(filter_result, 'content'):
+                logger.debug("LLM 內容存在，類型: %s", type(filter_result.content))
+            else:
+                logger.debug("LLM 結果沒有 content 屬性")
+
+        except Exception as llm_error:
+            logger.warning("LLM 調用失敗: %s", llm_error)
+            filter_result = None
+
+        # 解析篩選結果
+        if not filter_result or not hasattr(filter_result, 'content') or not filter_result.content:
+            logger.warning("LLM 篩選失敗: 沒有返回有效內容")
+            return None
+
+        filter_content = filter_result.content.strip()
+        logger.debug("LLM 原始回應: %.200s...", filter_content)
+
+        filter_content = strip_code_fence(filter_content)
+
+        try:
+            parsed_filter = json_utils.loads(filter_content)
+        except ValueError as e:
+            logger.warning("LLM 回應解析失敗: %s", e)
+            logger.debug("原始內容: %s", filter_content)
+            return None
+
+        relevant_tasks = parsed_filter.get("relevant_tasks", [])
+        if logger.isEnabledFor(logging.DEBUG):
+            for task in relevant_tasks:
+                score = task.get("relevance_score", 0)
+                if score and score > 0.3:
+                    logger.debug("  - %s: %.2f - %s", task.get('key', 'N/A'), score, task.get('reason', 'N/A'))
+        return {task["key"]: task.get("relevance_score", 0) for task in relevant_tasks if task.get("relevance_score") is not None}
+
+# AI 系統在第一次查詢時才建立：匯入模組（gunicorn 載入、開發伺服器重載）不會先建立 LLM 與 Jira 連線
+_ai = None
+_ai_lock = threading.Lock()
+
+
+def get_ai() -> JiraAgenticAI:
+    """取得 AI 系統，每個行程只建立一次"""
+    global _ai
+    if _ai is None:
+        with _ai_lock:
+            if _ai is None:
+                _ai = JiraAgenticAI()
+    return _ai
+
+def json_response(payload, status: int = 200) -> Response:
+    """以 json_utils（orjson 可用時）序列化回應，中文內容不經 ensure_ascii 跳脫"""
+    return Response(json_utils.dumps_bytes(payload), status=status, mimetype='application/json')
 
 @app.route('/')
 def index():
@@ -315,7 +455,7 @@ def search():
     }
 
     if not query:
-        return jsonify({'error': '請輸入查詢內容'}), 400
+        return json_response({'error': '請輸入查詢內容'}, 400)
 
     try:
         # 構建完整的查詢上下文
@@ -326,18 +466,20 @@ def search():
         }
 
         # 將完整的查詢上下文傳遞給 agent
-        result = ai.process_query(full_query)
-        return jsonify(result)
+        result = get_ai().process_query(full_query)
+        return json_response(result)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     # 創建 templates 目錄
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static', exist_ok=True)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
 
     print("啟動 Jira Agentic AI Web 介面...")
     print("請開啟瀏覽器，前往: http://localhost:8080")
     print("按 Ctrl+C 停止服務")
 
-    app.run(debug=True, host='127.0.0.1', port=8080)
\ No newline at end of file
+    # 每個請求大部分時間在等待 Jira 與 LLM，開發伺服器以多執行緒處理，同時送出的查詢不必排隊
+    app.run(debug=True, host='127.0.0.1', port=8080, threaded=True)
\ No newline at end of file